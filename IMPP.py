@@ -1,799 +1,1029 @@
-# compile using pyinstaller --windowed --onefile --icon=assets/petri-dish96.ico --add-data "assets/*.ico;assets/" --hidden-import babel.numbers --hidden-import winrt.windows.foundation.collections IMPP.py
-import sqlite3
-from datetime import datetime, timedelta
-import os
-from tkinter import Tk, ttk, filedialog, messagebox, PhotoImage, simpledialog
-import configparser
-import sys
-import threading
-from windows_toasts import Toast, ToastDisplayImage, WindowsToaster
-from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog, QInputDialog, QHBoxLayout, QMessageBox, QComboBox
-from PyQt5.QtGui import QIcon
-import customtkinter as ctk
-from tkcalendar import Calendar
-import webbrowser
-from win32com.client import Dispatch
-import winshell
-from PIL import Image
-import screeninfo
-
-# Directory converter for compiler
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
-
-# Icons
-main_icon = resource_path("assets\\IMPP\\IMPPcuteimp.png")
-toast_alert_icon = resource_path("assets\\IMPP\\IMPPcuteimpwarn.png")
-toast_expired_icon = resource_path("assets\\IMPP\\IMPPcuteimpexp.png")
-expired_icon = resource_path("assets\\IMPP\\IMPPcuteimpexptray.png")
-warn_icon = resource_path("assets\\IMPP\\IMPPcuteimpwarntray.png")
-app_logo = resource_path("assets\\IMPP\\IMPPcute.png")
-
-# Configuration files
-SETTINGS = "settings.ini"
-TRAY_ICON = main_icon
-
-# Global variables
-databases_window = None  # Initializes databases_window globally
-settings_window = False  # Initializes settings_window globally
-editor_window = False  # Initializes editor_window globally
-notifications_paused = False # Global variable to track if notifications are paused
-timer = None # initialise timer globally
-
-class DatabaseScanner:
-    def __init__(self, db_path):
-        self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-        self.cursor = self.conn.cursor()
-
-    def get_upcoming_events(self):
-        today = datetime.now().date()
-        days_setting = int(load_settings("Notifications", "notify_days"))
-        later = today + timedelta(days=days_setting)
-        query = "SELECT * FROM products WHERE expiry_date >= ? AND expiry_date <= ?"
-        self.cursor.execute(query, (today, later))
-        return self.cursor.fetchall()
-
-    def get_past_events(self):
-        yesterday = datetime.now().date() - timedelta(days=1)
-        query = "SELECT * FROM products WHERE expiry_date <= ?"
-        self.cursor.execute(query, (yesterday,))
-        return self.cursor.fetchall()
-
-    def close(self):
-        self.conn.close()
-
-class SettingsWindow(ctk.CTk):
-    def __init__(self, parent=None):
-        super().__init__()
-        global databases
-        global interval_set
-
-        ctk.set_appearance_mode("dark")
-        ctk.set_default_color_theme("dark-blue")
-        
-        # Create the main window
-        self.wm_iconbitmap(main_icon)
-        self.geometry("400x400")
-        self.resizable(width=False, height=False)
-        self.title("IMPP - Settings")
-
-        # Create a CTkTabview for managing tabs
-        tab_view = ctk.CTkTabview(master=self)
-        tab_view.pack(pady=10, expand=True, fill="both")
-
-        # Create tabs
-        tab_view.add("Database Settings")
-        tab_view.add("Notification Settings")
-        tab_view.add("About IMPP")
-
-        # Create layout for Database Settings Tab
-        # Add/load buttons
-        button_frame = ctk.CTkFrame(master=tab_view.tab("Database Settings"))
-        button_frame.pack(pady=5, fill="x")
-        addbutton = ctk.CTkButton(master=button_frame, text="Create New Database", command=self.create_database)
-        addbutton.pack(side="left")
-        loadbutton = ctk.CTkButton(master=button_frame, text="Load Database", command=self.load_database)
-        loadbutton.pack(side="right")
-        # Database list and delete button
-        databasetitlelabel = ctk.CTkLabel(master=tab_view.tab("Database Settings"), text="Loaded Databases:")
-        databasetitlelabel.pack()
-
-        databases = ttk.Treeview(master=tab_view.tab("Database Settings"), columns=("Name", "Location"), show="headings")
-        # Set the display names for the columns
-        databases.heading("Name", text="Name")
-        databases.heading("Location", text="Location")
-        databases.pack(fill="x", pady=5) #(expand=True, fill="both")
-
-        scrollbar = ctk.CTkScrollbar(databases)
-        scrollbar.configure(command=databases.yview)
-        scrollbar.pack(side="right", fill="y")
-        databases.configure(yscrollcommand=scrollbar.set)
-
-        self.refresh_databases()
-        
-        removebutton = ctk.CTkButton(master=tab_view.tab("Database Settings"), text="Remove Selected Database", command=lambda: self.remove_database(databases.item(databases.focus())["values"]))
-        removebutton.pack(pady=5, anchor="s")  
-
-        # Create layout for Notification Settings Tab
-        interval_label = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Notify me every...") 
-        interval_label.pack(pady=5)
-        interval_set = ctk.CTkComboBox(master=tab_view.tab("Notification Settings"), values=["15 minutes", "30 minutes", "1 hour", "2 hours", "3 hours", "4 hours", "24 hours"],
-                                     command=self.save_settings)
-        interval_set.set(self.interval_translator(int(load_settings("Notifications", "scan_interval"))))
-        interval_set.pack()
-
-        notify_before = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Only notify expiries happening in the next... (days)")
-        notify_before.pack(pady=5)
-        notify_entry = ctk.CTkEntry(master=tab_view.tab("Notification Settings"), placeholder_text="Number of days.")
-        notify_entry.bind('<Return>', lambda event: current_notify.configure(text=write_settings("Notifications", "notify_days", notify_entry.get())))
-        notify_entry.pack(pady=5)
-        current_notify_value = self.notification_days()
-        current_notify = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text=current_notify_value)
-        current_notify.pack()
-
-        startup_label = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Launch IMPP at system startup?") 
-        startup_label.pack(pady=5)
-        startup_set = ctk.CTkComboBox(master=tab_view.tab("Notification Settings"), values=["Yes", "No"],
-                                     command=self.startup)
-        startup_set.set(self.startup_check())
-        startup_set.pack()
-
-        # Create layout for About tab
-        imp = Image.open(main_icon)
-        pict = ctk.CTkImage(light_image=imp, dark_image=imp, size=(100, 100))
-        image = ctk.CTkLabel(master=tab_view.tab("About IMPP"), text="", image=pict)
-        image.pack()
-        text_box = ctk.CTkLabel(master=tab_view.tab("About IMPP"), text="IMPP was written by Ian Nicholls in Python 3.11 \nand is distributed under MIT licence.\nImage assets were developed using AI and edited by Ian Nicholls. ")
-        text_box.pack(pady=20)
-        github_button = ctk.CTkButton(master=tab_view.tab("About IMPP"), text="GitHub",command= lambda: webbrowser.open("https://github.com/Ian-Nicholls89/exPYre"))
-        github_button.pack()
-
-        # Catch when window is closed and allow it to be reopened again later
-        self.protocol("WM_DELETE_WINDOW", self.closeEvent)
-
-    def notification_days(self):
-        days = load_settings("Notifications", "notify_days")
-        return f"Current setting: {days} days."
-
-    def interval_translator(self, choice):
-        if choice == 15*60:
-            choice = "15 minutes"
-        elif choice == 30*60:
-            choice = "30 minutes"
-        elif choice == 60*60:
-            choice = "1 hour"
-        elif choice == 120*60:
-            choice = "2 hours"
-        elif choice == 180*60:
-            choice = "3 hours"
-        elif choice == 240*60:
-            choice = "4 hours"
-        elif choice == 24*60*60:
-            choice = "24 hours"
-        
-        return choice
-
-    def save_settings(self, choice):
-        if choice == "15 minutes":
-            choice = 15*60
-        elif choice == "30 minutes":
-            choice = 30*60
-        elif choice == "1 hour":
-            choice = 60*60
-        elif choice == "2 hours":
-            choice = 120*60
-        elif choice == "3 hours":
-            choice = 180*60
-        elif choice == "4 hours":
-            choice = 240*60
-        elif choice == "24 hours":
-            choice = 24*60*60
-        else:
-            choice = 180*60
-        write_settings("Notifications", "scan_interval", str(choice))
-        
-    def refresh_databases(self):
-        start = databases.get_children().__len__()
-        # Clear existing items in the listbox
-        for child in databases.get_children():
-            databases.delete(child)
-
-        # Add databases back to the listbox and get longest name length
-        database_list = load_settings("Databases", None) # placeholder used for key value as not needed to call databases from settings
-        column_width = 0
-        for name, location in database_list.items():
-            databases.insert("", "end", values=(name, location))
-            column_width = max(column_width, len(name))
-        end = databases.get_children().__len__()
-        databases.column("Name", width=column_width) # adjust the column width 
-
-        if not start == 0 and end > start: # if a database has been added then scan new database (assuming here that its the last database in the list)
-            for db_name, db_path in reversed(database_list.items()):
-                trigger_database_scan({db_name:db_path})
-                break            
-
-    def create_database(self):
-        # Create new db
-        file_path = create_new_db()
-
-        if file_path:
-            # Prompt the user to enter a custom name for the database
-            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
-            if not custom_name:
-                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
-                    
-            # Update the settings file with the new database path and custom name
-            write_settings("Databases", custom_name, file_path)
-            
-            # Refresh the UI to display the new database
-            self.refresh_databases()
-    
-    def load_database(self):
-        # User wants to load an existing database
-        file_path = filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
-        
-        if file_path:
-            # Prompt the user to enter a custom name for the database
-            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
-            if not custom_name:
-                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
-                
-            # Update the settings file with the new database path and custom name
-            write_settings("Databases", custom_name, file_path)
-            
-            # Refresh the UI to display the new database
-            self.refresh_databases()
-
-    def remove_database(self, name):
-            reply = messagebox.askyesno("Confirmation", f"Are you sure you want to delete \"{name[0]}\" database?")
-            if reply:
-                try:
-                    # Remove the database from settings
-                    config = configparser.ConfigParser()
-                    config.read(SETTINGS)
-                    config.remove_option("Databases", name[0])
-                    with open(SETTINGS, 'w+') as configfile:
-                        config.write(configfile)
-                    # Refresh the UI to update the displayed databases
-                    self.refresh_databases()
-                except ValueError:
-                    messagebox.showerror("Error", "Database not found.")
-    
-    def startup(self, choice):
-        startup_shortcut = os.path.join(winshell.startup(), "IMPP.lnk")
-        
-        if choice == "Yes":
-            shell = Dispatch('WScript.Shell')
-            startup = shell.CreateShortcut(startup_shortcut)
-            startup.TargetPath = os.path.join(os.path.abspath("."), "IMPP.exe")
-            startup.WorkingDirectory = os.path.abspath(".")
-            startup.save()
-        elif choice == "No":
-            if os.path.exists(startup_shortcut):
-                os.remove(startup_shortcut)
-            else:
-                return
-    
-    def startup_check(self):
-        if os.path.exists(os.path.join(winshell.startup(), "IMPP.lnk")):
-            choice = "Yes"
-            return choice
-        else:
-            choice = "No"
-            return choice
-
-    def closeEvent(self):
-        global settings_window
-        settings_window = False
-        self.destroy()
-
-class DatabaseEditor(ctk.CTk):
-    def __init__(self, parent=None):
-        super().__init__()
-        global treeview
-        global product_name_entry
-        global calendar
-        global database_settings
-        # Load all databases from settings file
-        database_settings = load_settings("Databases", None) # placeholder used for key value as not needed to call databases from settings
-
-        # Load first database into editing mode
-        for name, info in database_settings.items():
-            self.switch_database(name, info)
-            break
-
-        ctk.set_appearance_mode("light")
-        ctk.set_default_color_theme("blue")
-
-        # Create the main window
-        self.wm_iconbitmap(main_icon)
-        self.geometry("600x400")
-        self.title("IMPP - Database Editor")
-
-        # Create a dropdown menu
-        self.database_dropdown()
-        dropdown = ctk.CTkOptionMenu(self, values=list(db_names), command=self.change_database_dropdown)
-        dropdown.pack(padx=10, pady=10)
-
-        # Create a CTkTabview for managing tabs
-        tab_view = ctk.CTkTabview(master=self)
-        tab_view.pack(pady=10, expand=True, fill="both")
-
-        # Create tabs
-        tab_view.add("Show All Items")
-        tab_view.add("Add Products")
-
-        # Create a treeview for displaying products in tab1
-        treeview = ttk.Treeview(master=tab_view.tab("Show All Items"), columns=("Product", "Expiry Date"), show="headings")
-        treeview.heading("Product", text="Product")
-        treeview.heading("Expiry Date", text="Expiry Date")
-        treeview.pack(expand=True, fill="both")
-        
-
-        # Populate the treeview with sample data
-        self.populate_treeview(self.fetch_data())
-
-        # Create the delete button
-        delete_button = ctk.CTkButton(master=tab_view.tab("Show All Items"), text="Delete Selected", command=self.delete_item)
-        delete_button.pack(pady=10)
-
-        # Create entry fields and button for adding products in tab2
-        product_name_entry = ctk.CTkEntry(master=tab_view.tab("Add Products"), placeholder_text="Product Name")
-        product_name_entry.pack(pady=1)
-
-        # Expiry date label and calendar
-        expiry_label = ctk.CTkLabel(master=tab_view.tab("Add Products"), text="Expiry Date:")
-        expiry_label.pack(pady=1)
-        calendar = Calendar(master=tab_view.tab("Add Products"), selectmode='day')
-        calendar.pack(pady=5)
-
-        # Submit button
-        add_button = ctk.CTkButton(master=tab_view.tab("Add Products"), text="Add Product", command=self.add_product)
-        add_button.pack()
-
-        # Catch when window is closed and allow it to be reopened again later
-        self.protocol("WM_DELETE_WINDOW", self.closeEvent)
-
-    # Function to load the database files from the settings file
-    def load_settings(self):
-        global editor_window
-        if not os.path.exists(SETTINGS):
-            # If settings file doesn't exist, produce warning and close editor
-            messagebox.showwarning("Warning", "No database selected. Please select a database in IMPP settings.")
-            editor_window = False
-            self.destroy()
-        else:
-            config = configparser.ConfigParser()
-            config.read(SETTINGS)
-            try:
-                return dict(config['Settings'])
-            except KeyError:
-                messagebox.showwarning("Warning", "Settings read error. Exiting editor.")
-                editor_window = False
-                self.destroy()
-
-    def fetch_data(self):
-        # fetch all data
-        global items
-        conn = sqlite3.connect(db_location)
-        c = conn.cursor()
-        c.execute("SELECT * FROM products")
-        items = c.fetchall()
-        conn.close()
-
-        return items
-
-    def populate_treeview(self, products):
-        # Clear existing items in the treeview
-        for item in treeview.get_children():
-            treeview.delete(item)
-
-        # Add new products to the treeview
-        for id, product, expiry_date in products:
-            treeview.insert("", "end", values=(product, expiry_date))
-
-    def database_dropdown(self):
-        global db_names
-        db_names = []
-        for name, info in database_settings.items():
-            db_names.append(name)
-
-    def change_database_dropdown(self, name):
-        global db_location
-        if name in database_settings:
-            db_location = database_settings[name]
-            self.populate_treeview(self.fetch_data())
-
-    # Function to delete selected item
-    def delete_item(self):
-        selected_item_id = treeview.focus()
-        if selected_item_id:
-            confirm = messagebox.askyesno("Confirmation", "Are you sure you want to delete this item?")
-            if confirm:
-                try:
-                    # Convert string ID to integer index (assuming IDs are unique)
-                    selected_item_index = treeview.get_children().index(selected_item_id)
-                    selected_item_data = items[selected_item_index]  # Access data using the integer index
-                    selected_item_id = selected_item_data[0]  # Extract ID from the data list
-                    conn = sqlite3.connect(db_location)
-                    c = conn.cursor()
-                    c.execute("DELETE FROM products WHERE id=?", (selected_item_id,))
-                    conn.commit()
-                    conn.close()
-                    self.populate_treeview(self.fetch_data())
-                except ValueError:
-                    messagebox.showerror("Error", "Item not found in treeview.")
-
-    def add_product(self):
-        global calendar
-        global items    
-        # Get the product name from the entry widget
-        product_name = product_name_entry.get().strip() if product_name_entry else ''  # Strip whitespace from the input if product_entry is not None
-
-        # Check if the product name is empty
-        if not product_name:
-            messagebox.showinfo("Info", "Please enter a product name.")
-            product_name_entry.focus_set()  # Set focus to the product name entry widget
-            return
-
-        # Get the expiry date from the calendar widget
-        expiry_date = calendar.selection_get().strftime('%Y-%m-%d')
-
-        # Connect to the database and add the product
-        conn = sqlite3.connect(db_location)
-        c = conn.cursor()
-        c.execute("INSERT INTO products (name, expiry_date) VALUES (?, ?)", (product_name, expiry_date))
-        conn.commit()
-        conn.close()
-
-        # Clear the product entry widget
-        if product_name_entry:
-            product_name_entry.delete(0, ctk.END)
-            product_name_entry.focus_set()
-        
-        # Update the dataset in the database
-        self.populate_treeview(self.fetch_data())
-        
-
-    # Function to switch to a selected database
-    def switch_database(self, name, info):
-        global db_location
-        db_location = info
-
-    def closeEvent(self):
-        global editor_window
-        editor_window = False
-        self.destroy()
-
-def show_editor_window():
-    global editor_window
-    if editor_window is False:
-        editor_window = True
-        editor = DatabaseEditor()
-        editor.mainloop()
-
-def show_settings_window():
-    global settings_window
-    if settings_window is False:
-        settings_window = True
-        settings = SettingsWindow()
-        settings.mainloop()
-
-def show_toast(title, message):
-    toaster = WindowsToaster('IMPP')
-    newToast = Toast()
-    newToast.text_fields = [f"{title}", f"{message}"]
-    if "has now expired" in message:
-        newToast.AddImage(ToastDisplayImage.fromPath(toast_expired_icon))
-    elif "is expiring in" in message:
-        newToast.AddImage(ToastDisplayImage.fromPath(toast_alert_icon))    
-    newToast.on_activated = lambda _: show_editor_window()
-    toaster.show_toast(newToast)
-
-def get_database_path():
-    # Prompt the user with a custom dialog box
-    msg_box = QMessageBox()
-    msg_box.setWindowTitle("No Database Selected")
-    msg_box.setText("No database selected. What would you like to do?")
-    msg_box.addButton("Create New Database", QMessageBox.YesRole)
-    msg_box.addButton("Load Existing Database", QMessageBox.NoRole)
-    choice = msg_box.exec_()
-    
-
-    # Check the user's choice and handle accordingly
-    if choice == 0:
-        # User wants to create a new database
-        return create_new_db()    
-    elif choice == 1:
-        # User wants to load an existing database
-        return filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
-
-# Function to create a new database file
-def create_new_db():
-    file_path = filedialog.asksaveasfilename(defaultextension=".db", filetypes=[("Database files", "*.db")])
-    if file_path:
-        conn = sqlite3.connect(file_path)
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS products
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      name TEXT NOT NULL,
-                      expiry_date DATE NOT NULL)''')
-        conn.commit()
-        conn.close()
-        messagebox.showinfo("Info", f"New database created at the specified location.")
-        return file_path
-
-def load_settings(section, key):
-    # if settings file doesnt exist, create one, add default settings and continue
-    if not os.path.exists(SETTINGS):
-        write_settings("Notifications", "scan_interval", str(10800))
-        write_settings("Notifications", "notify_days", str(14))
-    # start configparser and read the settings file
-    config = configparser.ConfigParser()
-    config.read(SETTINGS)
-    # if the section is of databases then all databases must be read
-    if section == "Databases":
-        if not config.has_section(section): # if there is no databases in the settings file then none have previously been loaded and at least one must be loaded
-            database_path = get_database_path()
-            if database_path:
-                #  Prompt the user to enter a custom name for the database
-                custom_name, _ = QInputDialog.getText(None, "Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
-                if not custom_name:
-                    custom_name = os.path.basename(database_path)
-                write_settings(section, custom_name, database_path) # write that database into the settings - this will catch and ask if extra databases are to be added
-                config.read(SETTINGS) # reread the settings before loading again
-                return dict(config[section]) # return all the databases which have been added
-        elif config.has_section(section): # if the section exists then proceed with the loading
-            if key == None: # if a placeholder key is passed then load all databases
-                try:
-                    return dict(config[section])
-                except KeyError: # bail out of the program if there is a config read error
-                    QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
-                    exit_program()
-            else: # return only requested database info
-                try:
-                    setting = config.get(section, key)
-                    return {key:setting,} # if the setting exists then it is returned as a dict
-                except KeyError: # bail out of the program if there is a config read error
-                    QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
-                    exit_program()
-
-    # if the section is of notifcation settings then try and get requested key and return it
-    else:
-        try:
-            setting = config.get(section, key)
-            return setting # if the setting exists then it is returned
-        except KeyError:
-            QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
-            exit_program() # if something goes wrong bail out of the program
-
-def write_settings(section, key, value):
-    config = configparser.ConfigParser() # start configparser
-    if os.path.exists(SETTINGS): # read the settings file if it exists
-        config.read(SETTINGS)
-    if not config.has_section(section): # create the settings section if it doesnt exist
-            config.add_section(section)
-
-    if section == "Databases" and config.has_option(section, key): # catch when a user is tryng to add a database of a custom name which already exists
-        confirm = messagebox.askyesno("Confirmation", "A database by this name already exists. Do you want to overwrite?")
-        if confirm: # overwrite if user confirms
-            config.set(section, key, value)
-            with open (SETTINGS, "w+") as configfile:
-                config.write(configfile)
-        elif not confirm: # cancel addition if user aborts
-            messagebox.showinfo("Database not added.", "The database was not added. Try adding again using a different name.")
-            return
-    if section == "Databases":
-        for name, location in config[section].items():
-            if location == value:
-                messagebox.showinfo("Database not added.", f"This database already exists under the name \"{name}\"")
-                return
-    else: # if the setting is anything else then write it (this will overwrite settings in the notification section automatically)
-        config.set(section, key, value)
-        with open (SETTINGS, "w+") as configfile:
-            config.write(configfile)
-        if section == "Databases": # if adding a database ask if further databases are to be added
-            additional_databases_prompt()
-        elif key == "notify_days":
-            return SettingsWindow.notification_days(None)
-        
-def additional_databases_prompt():
-    # Ask user if they would like to monitor more databases
-    msg_box = QMessageBox()
-    msg_box.setIcon(QMessageBox.Question)
-    msg_box.setWindowTitle("Monitor More Databases")
-    msg_box.setText("Would you like to monitor further databases?")
-    msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
-    msg_box.setDefaultButton(QMessageBox.No)
-    response = msg_box.exec_()
-
-    if response == QMessageBox.Yes:
-        # Prompt the user with a custom dialog box
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("Add Database.")
-        msg_box.setText("What would you like to do?")
-        msg_box.addButton("Create New Database", QMessageBox.YesRole)
-        msg_box.addButton("Load Existing Database", QMessageBox.NoRole)
-        choice = msg_box.exec_()
-    
-        # Check the user's choice and handle accordingly
-        if choice == 0:
-            # User wants to create a new database
-            file_path = create_new_db()    
-        elif choice == 1:
-            # User wants to load an existing database
-            file_path = filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
-
-        if file_path:
-            # Prompt the user to enter a custom name for the database
-            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
-            if not custom_name:
-                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
-                
-            # Update the settings file with the new database path and custom name
-            write_settings("Databases", custom_name, file_path)
-        additional_databases_prompt()
-    else:
-        return
-
-def pause_notifications_24h():
-    global notifications_paused
-    global pause
-    notifications_paused = True
-
-    # Start a timer to resume notifications after 24 hours
-    pause = threading.Timer(24 * 60 * 60, resume_notifications)
-    pause.start()
-
-    # change submenu text and function to allow for unpausing
-    pause_notifications_action.setText("Unpause Notifications")
-    pause_notifications_action.triggered.connect(resume_notifications)
-
-def resume_notifications():
-    global notifications_paused
-    global pause
-    notifications_paused = False
-    if pause:
-        pause.cancel()
-    
-    # change submenu text and function to allow for pausing 
-    pause_notifications_action.setText("Pause Notifications for 24 Hours")
-    pause_notifications_action.triggered.connect(pause_notifications_24h)
-
-def trigger_database_scan(database_settings):
-    # Initialize the database scanner for each database
-    for db_name, db_path in database_settings.items():
-        db_path = str(db_path)  # Ensure db_path is a string
-        scanner = DatabaseScanner(db_path)
-
-        # Get upcoming events and show toast notifications if notifications are not paused
-        if not notifications_paused:
-            upcoming_events = scanner.get_upcoming_events()
-            for event in upcoming_events:
-                expiry_date = datetime.strptime(event[2], "%Y-%m-%d")
-                days_until_expiry = (expiry_date - datetime.now()).days
-                title = f"Upcoming Expiry in \"{db_name}\""
-                message = f"\"{event[1]}\" is expiring in {days_until_expiry + 1} days."
-                show_toast(title, message)
-
-                # update tray icon and tooltip
-                if tray_icon.icon().name() != expired_icon:
-                    tray_icon.setIcon(QIcon(warn_icon))
-                    tray_icon.setToolTip("IMPP - an item is nearing expiry")
-
-        # Get past events and show toast notifications if notifications are not paused
-        if not notifications_paused:
-            past_events = scanner.get_past_events()
-            for event in past_events:
-                title = f"Expiry in \"{db_name}\""
-                message = f"\"{event[1]}\" has now expired"
-                show_toast(title, message)
-
-                # update tray icon and tooltip
-                tray_icon.setIcon(QIcon(expired_icon))
-                tray_icon.setToolTip("IMPP - an item has expired")
-
-        # Close the database connection
-        scanner.close()
-
-# Define a function to start a timer for the specified time interval
-def start_timer(interval):
-    global timer
-    # Call perform_database_scan function immediately
-    trigger_database_scan(load_settings("Databases", None))
-    # Schedule the perform_database_scan function to run periodically at the specified interval
-    timer = threading.Timer(interval, start_timer, args=[interval])
-    timer.start()
-
-def tray_icon_double_clicked(reason):
-    if reason == QSystemTrayIcon.DoubleClick:
-        show_editor_window()
-
-def splash(screen_width, screen_height, x, y):
-    # create app splash
-    splash = ctk.CTk()
-    splash.attributes('-transparentcolor', 'gray')
-    splash.wm_attributes("-topmost", True)
-    pic = Image.open(app_logo)
-    splash_width = int(round(pic.width / 2)) 
-    splash_height = int(round(pic.height / 2)) 
-    splash.overrideredirect(True)
-    logo = ctk.CTkImage(light_image=pic, dark_image=pic, size=(splash_width, splash_height)) 
-    image = ctk.CTkLabel(splash, text="", image=logo, bg_color="gray")
-    image.pack(padx=0, pady=0)
-
-    # Center the window on the screen (might require adjustments based on CTk window manager handling)
-    center_x = ((screen_width - int(splash_width)) // 2) + x
-    center_y = ((screen_height - int(splash_height)) // 2) + y 
-    splash.geometry(f"{splash_width}x{splash_height}+{center_x}+{center_y}")  # Set geometry with position
-
-    # destroy app splash after 5 seconds
-    splash.after(5000, splash.quit)
-    splash.mainloop()
-
-def exit_program():
-    # Cancel the timer if it's running
-    global timer
-    if timer:
-        timer.cancel()
-
-    # Exit the program
-    sys.exit()
-
-def main():
-    # Extract the scan interval value from settings
-    scan_interval = int(load_settings("Notifications", "scan_interval"))  # Defaults to 3 hours
-
-    # Start interval timer with the scan interval
-    start_timer(scan_interval)
-
-if __name__ == "__main__":
-    for monitor in screeninfo.get_monitors():
-        if monitor.is_primary:
-            splash(monitor.width, monitor.height, monitor.x, monitor.y)
-
-    # begin creating main app
-    app = QApplication(sys.argv)
-
-    # Create a system tray icon
-    tray_icon = QSystemTrayIcon()
-    tray_icon.setIcon(QIcon(TRAY_ICON))
-    tray_icon.setToolTip("IMPP")
-
-    # Create a context menu for the system tray icon
-    tray_menu = QMenu()
-    scan_action = QAction("Scan Databases Now...", parent=app)
-    scan_action.triggered.connect(lambda: trigger_database_scan(load_settings("Databases", None)))
-    tray_menu.addAction(scan_action)
-    database_editor = QAction("Database Editor", parent=app)
-    database_editor.triggered.connect(show_editor_window)
-    tray_menu.addAction(database_editor)
-    pause_notifications_action = QAction("Pause Notifications for 24 Hours", parent=app)
-    pause_notifications_action.triggered.connect(pause_notifications_24h)
-    tray_menu.addAction(pause_notifications_action)
-    settings_action = QAction("Settings", parent=app)
-    settings_action.triggered.connect(show_settings_window)
-    tray_menu.addAction(settings_action)
-    exit_action = QAction("Exit", parent=app)
-    exit_action.triggered.connect(exit_program)
-    tray_menu.addAction(exit_action)
-
-    # Connect the activated signal to the tray_icon_double_clicked function
-    tray_icon.activated.connect(tray_icon_double_clicked)
-
-    # Set the tray menu for the system tray icon
-    tray_icon.setContextMenu(tray_menu)
-    tray_icon.show()
-
-    # Run the main function
-    main()
-
-    app.exec_()
+# compile using pyinstaller --windowed --onefile --icon=assets/petri-dish96.ico --add-data "assets/*.ico;assets/" --hidden-import babel.numbers --hidden-import winrt.windows.foundation.collections IMPP.py
+# GUI toolkits only needed by a window or action (toasts, the editor calendar, startup shortcuts, splash) are imported when first used
+from datetime import datetime
+from bisect import bisect_left
+import os
+from tkinter import ttk, filedialog, messagebox, simpledialog
+import configparser
+import sys
+import threading
+import sqlite3
+import csv
+import time
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QInputDialog, QMessageBox
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QObject, pyqtSignal
+import customtkinter as ctk
+import webbrowser
+from impp_core import SETTINGS, DEFAULT_SETTINGS, STARTUP_LOG, settings_store, connection_pool, scan_cache, create_database, scan_databases, scan_metrics, ScanResult, ProductPager, AttachedPager, search_products, search_attached_databases, insert_product, import_products, aggregate_notifications, soonest_expiring, ExpiryScheduler, NotificationDispatcher, notification_ledger, PhaseTimer, profiled, start_profile, save_profile
+
+# Directory converter for compiler
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+
+    return os.path.join(base_path, relative_path)
+
+# Icons
+main_icon = resource_path("assets\\IMPP\\IMPPcuteimp.png")
+toast_alert_icon = resource_path("assets\\IMPP\\IMPPcuteimpwarn.png")
+toast_expired_icon = resource_path("assets\\IMPP\\IMPPcuteimpexp.png")
+expired_icon = resource_path("assets\\IMPP\\IMPPcuteimpexptray.png")
+warn_icon = resource_path("assets\\IMPP\\IMPPcuteimpwarntray.png")
+app_logo = resource_path("assets\\IMPP\\IMPPcute.png")
+
+# Tray icon shown at startup
+TRAY_ICON = main_icon
+# Tray icon for each tray state (see ScanResult.tray_state), decoded once into tray_icons when the tray is created
+TRAY_ICONS = {"ok": TRAY_ICON, "warning": warn_icon, "expired": expired_icon}
+
+# Global variables
+databases_window = None  # Initializes databases_window globally
+settings_window = False  # Initializes settings_window globally
+editor_window = False  # Initializes editor_window globally
+notifications_paused = False # Global variable to track if notifications are paused
+scheduler = None # initialise scan scheduler globally
+notification_dispatcher = None # shows toasts on its own thread, started by main()
+tray_state = None # (state, expired, upcoming) from the last scan, the tray is only updated when this changes
+tray_icon_state = "ok" # state the tray icon is currently showing
+items = [] # products currently loaded into the editor, at most EDITOR_PAGE_SIZE * EDITOR_PAGES_LOADED of them
+EDITOR_PAGE_SIZE = 100 # products the editor reads from the database at a time
+EDITOR_PAGES_LOADED = 3 # pages kept in the editor's list, the visible page plus one either side to scroll into
+EDITOR_SEARCH_DELAY = 250 # milliseconds typing has to pause for before the editor searches
+EDITOR_SEARCH_LIMIT = 200 # search results shown in the editor
+TRAY_SOONEST_ITEMS = 10 # products listed in the tray's "Next to expire" menu
+ALL_DATABASES = "All databases" # editor dropdown entry listing the products in every database together
+REMIND_CHOICES = {"Every scan": 1, "4 hours": 4*60*60, "24 hours": 24*60*60, "7 days": 7*24*60*60, "Never": 0} # seconds, see remind_after
+
+class SettingsWindow(ctk.CTk):
+    def __init__(self, parent=None):
+        super().__init__()
+        global databases
+        global interval_set
+
+        ctk.set_appearance_mode("dark")
+        ctk.set_default_color_theme("dark-blue")
+        
+        # Create the main window
+        self.wm_iconbitmap(main_icon)
+        self.geometry("400x400")
+        self.resizable(width=False, height=False)
+        self.title("IMPP - Settings")
+
+        # Create a CTkTabview for managing tabs
+        tab_view = ctk.CTkTabview(master=self)
+        tab_view.pack(pady=10, expand=True, fill="both")
+
+        # Create tabs
+        tab_view.add("Database Settings")
+        tab_view.add("Notification Settings")
+        tab_view.add("About IMPP")
+
+        # Create layout for Database Settings Tab
+        # Add/load buttons
+        button_frame = ctk.CTkFrame(master=tab_view.tab("Database Settings"))
+        button_frame.pack(pady=5, fill="x")
+        addbutton = ctk.CTkButton(master=button_frame, text="Create New Database", command=self.create_database)
+        addbutton.pack(side="left")
+        loadbutton = ctk.CTkButton(master=button_frame, text="Load Database", command=self.load_database)
+        loadbutton.pack(side="right")
+        # Database list and delete button
+        databasetitlelabel = ctk.CTkLabel(master=tab_view.tab("Database Settings"), text="Loaded Databases:")
+        databasetitlelabel.pack()
+
+        databases = ttk.Treeview(master=tab_view.tab("Database Settings"), columns=("Name", "Location"), show="headings")
+        # Set the display names for the columns
+        databases.heading("Name", text="Name")
+        databases.heading("Location", text="Location")
+        databases.pack(fill="x", pady=5) #(expand=True, fill="both")
+
+        scrollbar = ctk.CTkScrollbar(databases)
+        scrollbar.configure(command=databases.yview)
+        scrollbar.pack(side="right", fill="y")
+        databases.configure(yscrollcommand=scrollbar.set)
+
+        self.refresh_databases()
+        
+        removebutton = ctk.CTkButton(master=tab_view.tab("Database Settings"), text="Remove Selected Database", command=lambda: self.remove_database(databases.item(databases.focus())["values"]))
+        removebutton.pack(pady=5, anchor="s")  
+
+        # Create layout for Notification Settings Tab
+        interval_label = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Notify me every...") 
+        interval_label.pack(pady=5)
+        interval_set = ctk.CTkComboBox(master=tab_view.tab("Notification Settings"), values=["15 minutes", "30 minutes", "1 hour", "2 hours", "3 hours", "4 hours", "24 hours"],
+                                     command=self.save_settings)
+        interval_set.set(self.interval_translator(settings_store.scan_interval))
+        interval_set.pack()
+
+        notify_before = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Only notify expiries happening in the next... (days)")
+        notify_before.pack(pady=5)
+        notify_entry = ctk.CTkEntry(master=tab_view.tab("Notification Settings"), placeholder_text="Number of days.")
+        notify_entry.bind('<Return>', lambda event: current_notify.configure(text=write_settings("Notifications", "notify_days", notify_entry.get())))
+        notify_entry.pack(pady=5)
+        current_notify_value = self.notification_days()
+        current_notify = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text=current_notify_value)
+        current_notify.pack()
+
+        startup_label = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Launch IMPP at system startup?") 
+        startup_label.pack(pady=5)
+        startup_set = ctk.CTkComboBox(master=tab_view.tab("Notification Settings"), values=["Yes", "No"],
+                                     command=self.startup)
+        startup_set.set(self.startup_check())
+        startup_set.pack()
+
+        remind_label = ctk.CTkLabel(master=tab_view.tab("Notification Settings"), text="Remind me about the same item again after...")
+        remind_label.pack(pady=5)
+        remind_set = ctk.CTkComboBox(master=tab_view.tab("Notification Settings"), values=list(REMIND_CHOICES),
+                                     command=lambda choice: write_settings("Notifications", "remind_after", str(REMIND_CHOICES[choice])))
+        remind_set.set(next((choice for choice, seconds in REMIND_CHOICES.items() if seconds == settings_store.remind_after), str(settings_store.remind_after)))
+        remind_set.pack()
+
+        # Create layout for About tab
+        from PIL import Image
+        imp = Image.open(main_icon)
+        pict = ctk.CTkImage(light_image=imp, dark_image=imp, size=(100, 100))
+        image = ctk.CTkLabel(master=tab_view.tab("About IMPP"), text="", image=pict)
+        image.pack()
+        text_box = ctk.CTkLabel(master=tab_view.tab("About IMPP"), text="IMPP was written by Ian Nicholls in Python 3.11 \nand is distributed under MIT licence.\nImage assets were developed using AI and edited by Ian Nicholls. ")
+        text_box.pack(pady=20)
+        github_button = ctk.CTkButton(master=tab_view.tab("About IMPP"), text="GitHub",command= lambda: webbrowser.open("https://github.com/Ian-Nicholls89/exPYre"))
+        github_button.pack()
+
+        # Performance profiles of scans, the editor and startup for bug reports, saved in the profiles folder
+        profiling_label = ctk.CTkLabel(master=tab_view.tab("About IMPP"), text="Record performance profiles? (applies after restarting IMPP)")
+        profiling_label.pack(pady=5)
+        profiling_set = ctk.CTkComboBox(master=tab_view.tab("About IMPP"), values=["Yes", "No"],
+                                        command=lambda choice: write_settings("Profiling", "enabled", choice.lower()))
+        profiling_set.set("Yes" if settings_store.profiling else "No")
+        profiling_set.pack()
+
+        # Catch when window is closed and allow it to be reopened again later
+        self.protocol("WM_DELETE_WINDOW", self.closeEvent)
+
+    def notification_days(self):
+        days = settings_store.notify_days
+        return f"Current setting: {days} days."
+
+    def interval_translator(self, choice):
+        if choice == 15*60:
+            choice = "15 minutes"
+        elif choice == 30*60:
+            choice = "30 minutes"
+        elif choice == 60*60:
+            choice = "1 hour"
+        elif choice == 120*60:
+            choice = "2 hours"
+        elif choice == 180*60:
+            choice = "3 hours"
+        elif choice == 240*60:
+            choice = "4 hours"
+        elif choice == 24*60*60:
+            choice = "24 hours"
+        
+        return choice
+
+    def save_settings(self, choice):
+        if choice == "15 minutes":
+            choice = 15*60
+        elif choice == "30 minutes":
+            choice = 30*60
+        elif choice == "1 hour":
+            choice = 60*60
+        elif choice == "2 hours":
+            choice = 120*60
+        elif choice == "3 hours":
+            choice = 180*60
+        elif choice == "4 hours":
+            choice = 240*60
+        elif choice == "24 hours":
+            choice = 24*60*60
+        else:
+            choice = 180*60
+        write_settings("Notifications", "scan_interval", str(choice))
+        if scheduler:
+            scheduler.wake(rescan=False) # pick up the new interval straight away
+        
+    def refresh_databases(self):
+        start = databases.get_children().__len__()
+        # Clear existing items in the listbox
+        for child in databases.get_children():
+            databases.delete(child)
+
+        # Add databases back to the listbox and get longest name length
+        database_list = load_settings("Databases", None) # placeholder used for key value as not needed to call databases from settings
+        column_width = 0
+        for name, location in database_list.items():
+            databases.insert("", "end", values=(name, location))
+            column_width = max(column_width, len(name))
+        end = databases.get_children().__len__()
+        databases.column("Name", width=column_width) # adjust the column width 
+
+        if not start == 0 and end > start: # if a database has been added then scan new database (assuming here that its the last database in the list)
+            for db_name, db_path in reversed(database_list.items()):
+                trigger_database_scan({db_name:db_path})
+                break            
+
+    def create_database(self):
+        # Create new db
+        file_path = create_new_db()
+
+        if file_path:
+            # Prompt the user to enter a custom name for the database
+            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
+            if not custom_name:
+                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
+                    
+            # Update the settings file with the new database path and custom name
+            write_settings("Databases", custom_name, file_path)
+            
+            # Refresh the UI to display the new database
+            self.refresh_databases()
+    
+    def load_database(self):
+        # User wants to load an existing database
+        file_path = filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
+        
+        if file_path:
+            # Prompt the user to enter a custom name for the database
+            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
+            if not custom_name:
+                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
+                
+            # Update the settings file with the new database path and custom name
+            write_settings("Databases", custom_name, file_path)
+            
+            # Refresh the UI to display the new database
+            self.refresh_databases()
+
+    def remove_database(self, name):
+            reply = messagebox.askyesno("Confirmation", f"Are you sure you want to delete \"{name[0]}\" database?")
+            if reply:
+                try:
+                    # Remove the database from settings
+                    settings_store.remove("Databases", name[0])
+                    # Refresh the UI to update the displayed databases
+                    self.refresh_databases()
+                except ValueError:
+                    messagebox.showerror("Error", "Database not found.")
+    
+    def startup(self, choice):
+        from win32com.client import Dispatch
+        import winshell
+        startup_shortcut = os.path.join(winshell.startup(), "IMPP.lnk")
+        
+        if choice == "Yes":
+            shell = Dispatch('WScript.Shell')
+            startup = shell.CreateShortcut(startup_shortcut)
+            startup.TargetPath = os.path.join(os.path.abspath("."), "IMPP.exe")
+            startup.WorkingDirectory = os.path.abspath(".")
+            startup.save()
+        elif choice == "No":
+            if os.path.exists(startup_shortcut):
+                os.remove(startup_shortcut)
+            else:
+                return
+    
+    def startup_check(self):
+        import winshell
+        if os.path.exists(os.path.join(winshell.startup(), "IMPP.lnk")):
+            choice = "Yes"
+            return choice
+        else:
+            choice = "No"
+            return choice
+
+    def closeEvent(self):
+        global settings_window
+        settings_window = False
+        self.destroy()
+
+class DatabaseEditor(ctk.CTk):
+    def __init__(self, parent=None):
+        super().__init__()
+        global treeview
+        global product_name_entry
+        global calendar
+        global database_settings
+        # Load all databases from settings file
+        database_settings = load_settings("Databases", None) # placeholder used for key value as not needed to call databases from settings
+
+        # Load first database into editing mode
+        for name, info in database_settings.items():
+            self.switch_database(name, info)
+            break
+
+        ctk.set_appearance_mode("light")
+        ctk.set_default_color_theme("blue")
+
+        # Create the main window
+        self.wm_iconbitmap(main_icon)
+        self.geometry("600x400")
+        self.title("IMPP - Database Editor")
+
+        # Create a dropdown menu
+        self.database_dropdown()
+        dropdown = ctk.CTkOptionMenu(self, values=list(db_names) + [ALL_DATABASES], command=self.change_database_dropdown)
+        dropdown.pack(padx=10, pady=10)
+
+        # Create a CTkTabview for managing tabs
+        tab_view = ctk.CTkTabview(master=self)
+        tab_view.pack(pady=10, expand=True, fill="both")
+
+        # Create tabs
+        tab_view.add("Show All Items")
+        tab_view.add("Add Products")
+
+        # Search box, matching products are shown ranked best match first in place of the paged list
+        self.search_entry = ctk.CTkEntry(master=tab_view.tab("Show All Items"), placeholder_text="Search products...")
+        self.search_entry.pack(fill="x", pady=(0, 5))
+        self.search_entry.bind("<KeyRelease>", self.on_search_typed)
+        self.search_job = None
+
+        # Create a treeview for displaying products in tab1, click a heading to sort by it
+        self.sort_order = "expiry"
+        treeview = ttk.Treeview(master=tab_view.tab("Show All Items"), columns=("Product", "Expiry Date", "Database"),
+                                displaycolumns=("Product", "Expiry Date"), show="headings")
+        treeview.heading("Product", text="Product", command=lambda: self.sort_products("name"))
+        treeview.heading("Expiry Date", text="Expiry Date", command=lambda: self.sort_products("expiry"))
+        treeview.heading("Database", text="Database") # only shown in the all databases view
+        treeview.pack(expand=True, fill="both")
+
+        # Only a few pages of products are loaded at once, more are read in as the list is scrolled
+        self.scrollbar = ctk.CTkScrollbar(treeview)
+        self.scrollbar.configure(command=treeview.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        treeview.configure(yscrollcommand=self.on_scroll)
+        self.loading_page = False
+
+
+        # Populate the treeview with sample data
+        self.show_products()
+
+        # Create the delete button
+        delete_button = ctk.CTkButton(master=tab_view.tab("Show All Items"), text="Delete Selected", command=self.delete_item)
+        delete_button.pack(pady=10)
+
+        # Create entry fields and button for adding products in tab2
+        product_name_entry = ctk.CTkEntry(master=tab_view.tab("Add Products"), placeholder_text="Product Name")
+        product_name_entry.pack(pady=1)
+
+        # Expiry date label and calendar
+        expiry_label = ctk.CTkLabel(master=tab_view.tab("Add Products"), text="Expiry Date:")
+        expiry_label.pack(pady=1)
+        from tkcalendar import Calendar
+        calendar = Calendar(master=tab_view.tab("Add Products"), selectmode='day')
+        calendar.pack(pady=5)
+
+        # Submit button
+        add_button = ctk.CTkButton(master=tab_view.tab("Add Products"), text="Add Product", command=self.add_product)
+        add_button.pack()
+
+        # Bulk import button for delivery manifests
+        self.import_button = ctk.CTkButton(master=tab_view.tab("Add Products"), text="Import from CSV/Excel...", command=self.import_file)
+        self.import_button.pack(pady=5)
+
+        # Catch when window is closed and allow it to be reopened again later
+        self.protocol("WM_DELETE_WINDOW", self.closeEvent)
+
+    # Function to load the database files from the settings file
+    def load_settings(self):
+        global editor_window
+        if not os.path.exists(SETTINGS):
+            # If settings file doesn't exist, produce warning and close editor
+            messagebox.showwarning("Warning", "No database selected. Please select a database in IMPP settings.")
+            editor_window = False
+            self.destroy()
+        else:
+            config = configparser.ConfigParser()
+            config.read(SETTINGS)
+            try:
+                return dict(config['Settings'])
+            except KeyError:
+                messagebox.showwarning("Warning", "Settings read error. Exiting editor.")
+                editor_window = False
+                self.destroy()
+
+    @profiled("editor_fetch_data")
+    def fetch_data(self):
+        # fetch the first page of products in the current sort order
+        global items
+        global pager
+        if db_location is None: # all databases
+            pager = AttachedPager(database_settings, self.sort_order, EDITOR_PAGE_SIZE)
+        else:
+            pager = ProductPager(db_location, self.sort_order, EDITOR_PAGE_SIZE)
+        items = pager.first_page()
+        self.at_start = True
+        self.at_end = len(items) < EDITOR_PAGE_SIZE
+
+        return items
+
+    def show_products(self):
+        # Show the products matching the search box, or page through all of them if nothing has been typed
+        global items
+        self.search_job = None
+        search_text = self.search_entry.get().strip()
+        if search_text:
+            if db_location is None:
+                items = search_attached_databases(database_settings, search_text, EDITOR_SEARCH_LIMIT)
+            else:
+                items = search_products(db_location, search_text, EDITOR_SEARCH_LIMIT)
+            self.at_start = self.at_end = True # search results aren't paged
+            self.populate_treeview(items)
+        else:
+            self.populate_treeview(self.fetch_data())
+
+    def on_search_typed(self, event):
+        # Wait until typing pauses before searching, rather than searching on every key press
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(EDITOR_SEARCH_DELAY, self.show_products)
+
+    def sort_products(self, order):
+        self.sort_order = order
+        self.show_products()
+
+    def on_scroll(self, first, last):
+        # Keep the scrollbar in step and read the next (or previous) page in before the user reaches the end of what is loaded
+        self.scrollbar.set(first, last)
+        if self.loading_page or not items:
+            return
+        if float(last) > 0.9 and not self.at_end:
+            self.loading_page = True
+            self.after_idle(self.load_next_page)
+        elif float(first) < 0.1 and not self.at_start:
+            self.loading_page = True
+            self.after_idle(self.load_previous_page)
+
+    def load_next_page(self):
+        global items
+        products = pager.page_after(items[-1])
+        self.at_end = len(products) < EDITOR_PAGE_SIZE
+        for row in products:
+            self.insert_row("end", row)
+        items = items + products
+
+        # Drop pages from the top so the list never holds more than EDITOR_PAGES_LOADED pages
+        surplus = len(items) - EDITOR_PAGE_SIZE * EDITOR_PAGES_LOADED
+        if surplus > 0:
+            top = treeview.yview()[0] * len(items) # keep the same rows on screen after the ones above are removed
+            treeview.delete(*treeview.get_children()[:surplus])
+            items = items[surplus:]
+            self.at_start = False
+            treeview.yview_moveto((top - surplus) / len(items))
+        self.loading_page = False
+
+    def load_previous_page(self):
+        global items
+        products = pager.page_before(items[0])
+        self.at_start = len(products) < EDITOR_PAGE_SIZE
+        top = treeview.yview()[0] * len(items)
+        for position, row in enumerate(products):
+            self.insert_row(position, row)
+        items = products + items
+
+        # Drop pages from the bottom so the list never holds more than EDITOR_PAGES_LOADED pages
+        surplus = len(items) - EDITOR_PAGE_SIZE * EDITOR_PAGES_LOADED
+        if surplus > 0:
+            treeview.delete(*treeview.get_children()[-surplus:])
+            items = items[:-surplus]
+            self.at_end = False
+        treeview.yview_moveto((top + len(products)) / len(items)) # keep the same rows on screen after the new ones above
+        self.loading_page = False
+
+    @profiled("editor_populate_treeview")
+    def populate_treeview(self, products):
+        # Clear existing items in the treeview
+        for item in treeview.get_children():
+            treeview.delete(item)
+
+        # Add new products to the treeview
+        for row in products:
+            self.insert_row("end", row)
+
+    def insert_row(self, position, row):
+        # Each row's item ID is the product's id in the database, followed by "@" and the database's name in the all databases view
+        id, product, expiry_date, *database = row
+        treeview.insert("", position, iid="@".join([str(id), *database]), values=(product, expiry_date, *database))
+
+    def database_dropdown(self):
+        global db_names
+        db_names = []
+        for name, info in database_settings.items():
+            db_names.append(name)
+
+    def change_database_dropdown(self, name):
+        global db_location
+        if name in database_settings:
+            db_location = database_settings[name]
+            treeview.configure(displaycolumns=("Product", "Expiry Date"))
+            self.show_products()
+        elif name == ALL_DATABASES:
+            db_location = None
+            treeview.configure(displaycolumns=("Product", "Expiry Date", "Database"))
+            self.show_products()
+
+    # Function to delete selected item
+    def delete_item(self):
+        selected_item_id = treeview.focus()
+        if selected_item_id:
+            confirm = messagebox.askyesno("Confirmation", "Are you sure you want to delete this item?")
+            if confirm:
+                # The row's item ID is the product's id (and database), so delete it from the database and the treeview directly
+                product_id, _, name = selected_item_id.partition("@")
+                db_path = database_settings[name] if name else db_location
+                with connection_pool.connection(db_path) as conn:
+                    conn.execute("DELETE FROM products WHERE id=?", (int(product_id),))
+                    conn.commit()
+                scan_cache.invalidate(db_path)
+                del items[treeview.index(selected_item_id)] # items mirrors the rows loaded into the treeview
+                treeview.delete(selected_item_id)
+
+    def add_product(self):
+        if db_location is None:
+            messagebox.showinfo("Info", "Choose the database to add products to first.")
+            return
+
+        # Get the product name from the entry widget
+        product_name = product_name_entry.get().strip() if product_name_entry else ''  # Strip whitespace from the input if product_entry is not None
+
+        # Check if the product name is empty
+        if not product_name:
+            messagebox.showinfo("Info", "Please enter a product name.")
+            product_name_entry.focus_set()  # Set focus to the product name entry widget
+            return
+
+        # Get the expiry date from the calendar widget
+        expiry_date = calendar.selection_get().strftime('%Y-%m-%d')
+
+        # Connect to the database and add the product
+        with connection_pool.connection(db_location) as conn:
+            product_id = insert_product(conn, product_name, expiry_date)
+            conn.commit()
+        scan_cache.invalidate(db_location)
+
+        # Clear the product entry widget
+        if product_name_entry:
+            product_name_entry.delete(0, ctk.END)
+            product_name_entry.focus_set()
+        
+        if self.search_entry.get().strip(): # search results are ranked rather than sorted, so search again
+            self.show_products()
+            return
+
+        # Insert the new product into the treeview in sort order, unless it falls outside the pages currently loaded
+        # (it will be read in with its page when the list is scrolled to it)
+        row = (product_id, product_name, expiry_date)
+        position = bisect_left(items, pager.sort_key(row), key=pager.sort_key)
+        if (position > 0 or self.at_start) and (position < len(items) or self.at_end):
+            items.insert(position, row)
+            treeview.insert("", position, iid=str(product_id), values=(product_name, expiry_date))
+            treeview.see(str(product_id))
+
+    def import_file(self):
+        if db_location is None:
+            messagebox.showinfo("Info", "Choose the database to import products into first.")
+            return
+        file_path = filedialog.askopenfilename(title="Select Manifest", filetypes=[("Manifests", "*.csv *.xlsx"), ("CSV Files", "*.csv"), ("Excel Files", "*.xlsx")])
+        if not file_path:
+            return
+        # Import on a background thread so the editor doesn't freeze on large files, checking back until it has finished
+        result = {}
+        def run_import(db_path):
+            try:
+                result["report"] = import_products(db_path, file_path)
+            except (OSError, ValueError, csv.Error, sqlite3.Error) as error: # unreadable file, bad rows, locked or read only database
+                result["error"] = error
+        importer = threading.Thread(target=run_import, args=(db_location,), daemon=True)
+        importer.start()
+        self.import_button.configure(state="disabled", text="Importing...")
+
+        def check_import():
+            if importer.is_alive():
+                self.after(100, check_import)
+                return
+            self.import_button.configure(state="normal", text="Import from CSV/Excel...")
+            if "error" in result:
+                messagebox.showerror("Import Failed", str(result["error"]))
+            else:
+                messagebox.showinfo("Import Complete", str(result["report"]))
+                self.show_products()
+        self.after(100, check_import)
+
+    # Function to switch to a selected database
+    def switch_database(self, name, info):
+        global db_location
+        db_location = info
+
+    def closeEvent(self):
+        global editor_window
+        editor_window = False
+        self.destroy()
+
+def show_editor_window():
+    global editor_window
+    if editor_window is False:
+        editor_window = True
+        editor = DatabaseEditor()
+        editor.mainloop()
+
+def show_settings_window():
+    global settings_window
+    if settings_window is False:
+        settings_window = True
+        settings = SettingsWindow()
+        settings.mainloop()
+
+class WindowsToastBackend:
+    # Shows notifications as Windows toasts for NotificationDispatcher, one toaster is made on first use and reused
+    def __init__(self):
+        self.toaster = None
+
+    def show(self, title, message, status=None):
+        from windows_toasts import Toast, ToastDisplayImage, WindowsToaster
+        if self.toaster is None:
+            self.toaster = WindowsToaster('IMPP')
+        newToast = Toast()
+        newToast.text_fields = [f"{title}", f"{message}"]
+        if status == "expired":
+            newToast.AddImage(ToastDisplayImage.fromPath(toast_expired_icon))
+        elif status == "upcoming":
+            newToast.AddImage(ToastDisplayImage.fromPath(toast_alert_icon))
+        newToast.on_activated = lambda _: show_editor_window()
+        self.toaster.show_toast(newToast)
+
+def get_database_path():
+    # Prompt the user with a custom dialog box
+    msg_box = QMessageBox()
+    msg_box.setWindowTitle("No Database Selected")
+    msg_box.setText("No database selected. What would you like to do?")
+    msg_box.addButton("Create New Database", QMessageBox.YesRole)
+    msg_box.addButton("Load Existing Database", QMessageBox.NoRole)
+    choice = msg_box.exec_()
+    
+
+    # Check the user's choice and handle accordingly
+    if choice == 0:
+        # User wants to create a new database
+        return create_new_db()    
+    elif choice == 1:
+        # User wants to load an existing database
+        return filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
+
+# Function to create a new database file
+def create_new_db():
+    file_path = filedialog.asksaveasfilename(defaultextension=".db", filetypes=[("Database files", "*.db")])
+    if file_path:
+        create_database(file_path)
+        messagebox.showinfo("Info", f"New database created at the specified location.")
+        return file_path
+
+def load_settings(section, key):
+    # if settings file doesnt exist, create one, add default settings and continue
+    if not os.path.exists(SETTINGS):
+        write_settings("Notifications", "scan_interval", DEFAULT_SETTINGS["Notifications"]["scan_interval"])
+        write_settings("Notifications", "notify_days", DEFAULT_SETTINGS["Notifications"]["notify_days"])
+    # get the cached settings, these are only re-read from disk if the file has changed
+    config = settings_store.current()
+    # if the section is of databases then all databases must be read
+    if section == "Databases":
+        if not config.has_section(section): # if there is no databases in the settings file then none have previously been loaded and at least one must be loaded
+            database_path = get_database_path()
+            if database_path:
+                #  Prompt the user to enter a custom name for the database
+                custom_name, _ = QInputDialog.getText(None, "Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
+                if not custom_name:
+                    custom_name = os.path.basename(database_path)
+                write_settings(section, custom_name, database_path) # write that database into the settings - this will catch and ask if extra databases are to be added
+                return settings_store.section(section) # return all the databases which have been added
+        elif config.has_section(section): # if the section exists then proceed with the loading
+            if key == None: # if a placeholder key is passed then load all databases
+                try:
+                    return settings_store.section(section)
+                except KeyError: # bail out of the program if there is a config read error
+                    QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
+                    exit_program()
+            else: # return only requested database info
+                try:
+                    setting = settings_store.get(section, key)
+                    return {key:setting,} # if the setting exists then it is returned as a dict
+                except KeyError: # bail out of the program if there is a config read error
+                    QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
+                    exit_program()
+
+    # if the section is of notifcation settings then try and get requested key and return it
+    else:
+        try:
+            return settings_store.get(section, key) # if the setting exists (or has a default) then it is returned
+        except KeyError:
+            QMessageBox.warning(None, "Warning", "Settings Read Error. Exiting.", QMessageBox.Ok)
+            exit_program() # if something goes wrong bail out of the program
+
+def write_settings(section, key, value):
+    # settings are written through the cache so they don't need to be read back from disk
+    if section == "Databases":
+        databases = settings_store.section(section)
+        if key in databases: # catch when a user is tryng to add a database of a custom name which already exists
+            confirm = messagebox.askyesno("Confirmation", "A database by this name already exists. Do you want to overwrite?")
+            if not confirm: # cancel addition if user aborts
+                messagebox.showinfo("Database not added.", "The database was not added. Try adding again using a different name.")
+                return
+        else:
+            for name, location in databases.items():
+                if location == value:
+                    messagebox.showinfo("Database not added.", f"This database already exists under the name \"{name}\"")
+                    return
+        settings_store.set(section, key, value)
+        additional_databases_prompt() # if adding a database ask if further databases are to be added
+    else: # if the setting is anything else then write it (this will overwrite settings in the notification section automatically)
+        settings_store.set(section, key, value)
+        if key == "notify_days":
+            return SettingsWindow.notification_days(None)
+        
+def additional_databases_prompt():
+    # Ask user if they would like to monitor more databases
+    msg_box = QMessageBox()
+    msg_box.setIcon(QMessageBox.Question)
+    msg_box.setWindowTitle("Monitor More Databases")
+    msg_box.setText("Would you like to monitor further databases?")
+    msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+    msg_box.setDefaultButton(QMessageBox.No)
+    response = msg_box.exec_()
+
+    if response == QMessageBox.Yes:
+        # Prompt the user with a custom dialog box
+        msg_box = QMessageBox()
+        msg_box.setWindowTitle("Add Database.")
+        msg_box.setText("What would you like to do?")
+        msg_box.addButton("Create New Database", QMessageBox.YesRole)
+        msg_box.addButton("Load Existing Database", QMessageBox.NoRole)
+        choice = msg_box.exec_()
+    
+        # Check the user's choice and handle accordingly
+        if choice == 0:
+            # User wants to create a new database
+            file_path = create_new_db()    
+        elif choice == 1:
+            # User wants to load an existing database
+            file_path = filedialog.askopenfilename(title="Select Database File", filetypes=[("Database Files", "*.db")])
+
+        if file_path:
+            # Prompt the user to enter a custom name for the database
+            custom_name = simpledialog.askstring("Custom Name", "Enter a custom name for the database (optional):\n\n e.g 'PCR Lab Reagents'")
+            if not custom_name:
+                custom_name = os.path.basename(file_path)  # Use the database file name as the custom name
+                
+            # Update the settings file with the new database path and custom name
+            write_settings("Databases", custom_name, file_path)
+        additional_databases_prompt()
+    else:
+        return
+
+def pause_notifications_24h():
+    global notifications_paused
+    global pause
+    notifications_paused = True
+
+    # Start a timer to resume notifications after 24 hours
+    pause = threading.Timer(24 * 60 * 60, resume_notifications)
+    pause.start()
+
+    # change submenu text and function to allow for unpausing
+    pause_notifications_action.setText("Unpause Notifications")
+    pause_notifications_action.triggered.connect(resume_notifications)
+
+def resume_notifications():
+    global notifications_paused
+    global pause
+    notifications_paused = False
+    if pause:
+        pause.cancel()
+    
+    # change submenu text and function to allow for pausing 
+    pause_notifications_action.setText("Pause Notifications for 24 Hours")
+    pause_notifications_action.triggered.connect(pause_notifications_24h)
+
+@profiled("scan")
+def trigger_database_scan(database_settings):
+    # Scans the databases, notifies and returns when the next product changes state (datetime) or None
+    global tray_state
+    # Nothing to show if notifications are paused
+    if notifications_paused:
+        return None
+
+    notify_days = settings_store.notify_days
+    workers = settings_store.scan_workers
+    cycle_start = time.perf_counter()
+    # False when only some databases are scanned (e.g. one just added in settings), which mustn't replace what the tray shows for the rest
+    full_scan = database_settings == settings_store.databases
+
+    # Get upcoming and expired products from every database and queue summary toast notifications, they are shown
+    # by notification_dispatcher's thread so the scan doesn't wait for them
+    scan_result = ScanResult.collect(scan_databases(database_settings, notify_days, workers, settings_store.scan_method))
+    # only products which have just come due or expired, or haven't been mentioned for a while, are notified
+    try:
+        announce = notification_ledger.unannounced(scan_result, settings_store.remind_after)
+    except sqlite3.Error: # ledger unreadable (e.g. locked), notify everything rather than nothing
+        announce = scan_result
+    notifications = aggregate_notifications(announce, settings_store.summary_items, settings_store.max_notifications)
+    for title, message, status, db_name in notifications:
+        notification_dispatcher.notify(title, message, status, db_name)
+
+    # update tray icon and tooltip, on the main thread and only when the counts or state have changed since the last full scan
+    state = scan_result.tray_state()
+    if full_scan and state != tray_state:
+        tray_state = state
+        tray_signals.state_changed.emit(*state)
+
+    # refresh the "Next to expire" menu, on the main thread as this runs on the scheduler's
+    if full_scan:
+        tray_signals.soonest_changed.emit(soonest_expiring(database_settings, TRAY_SOONEST_ITEMS, workers))
+
+    # save the scan metrics for node exporter, if a textfile has been set in the settings
+    scan_metrics.cycle(time.perf_counter() - cycle_start)
+    if settings_store.metrics_textfile:
+        try:
+            scan_metrics.write_textfile(settings_store.metrics_textfile)
+        except OSError: # folder gone or not writable, try again after the next scan
+            pass
+
+    next_change = scan_result.next_change()
+    return datetime.strptime(next_change, "%Y-%m-%d") if next_change else None
+
+def tray_icon_double_clicked(reason):
+    if reason == QSystemTrayIcon.DoubleClick:
+        show_editor_window()
+
+class TraySignals(QObject):
+    # Qt widgets may only be touched from the main thread, so scans on other threads update the tray through these signals
+    soonest_changed = pyqtSignal(list)
+    state_changed = pyqtSignal(str, int, int) # state, expired, upcoming
+
+def update_tray_state(state, expired, upcoming):
+    # Show a tray state from the last scan, the icon is only swapped when the state itself changes
+    global tray_icon_state
+    if state != tray_icon_state:
+        tray_icon.setIcon(tray_icons[state])
+        tray_icon_state = state
+    if state == "expired":
+        tray_icon.setToolTip(f"IMPP - {expired} expired, {upcoming} nearing expiry")
+    elif state == "warning":
+        tray_icon.setToolTip(f"IMPP - {upcoming} nearing expiry")
+    else:
+        tray_icon.setToolTip("IMPP")
+
+def update_soonest_menu(soonest):
+    # Rebuild the "Next to expire" menu from (database, id, name, expiry_date) rows, soonest first
+    soonest_menu.clear()
+    for db_name, id, product, expiry_date in soonest:
+        action = soonest_menu.addAction(f"{expiry_date}  {product} ({db_name})".replace("&", "&&")) # a single & would underline the next letter
+        action.triggered.connect(show_editor_window)
+    if not soonest:
+        soonest_menu.addAction("Nothing due to expire").setEnabled(False)
+
+def warm_up(startup_timer):
+    # Runs in the background while the splash shows: read the settings, open (and upgrade) every database and scan them,
+    # so the first scheduled scan is answered from the connection pool and scan cache
+    database_settings = settings_store.databases
+    startup_timer.mark("settings_loaded")
+    if database_settings:
+        list(scan_databases(database_settings, settings_store.notify_days, settings_store.scan_workers, settings_store.scan_method))
+    startup_timer.mark("warmed_up")
+
+def splash(screen_width, screen_height, x, y, warming_up):
+    # create app splash
+    from PIL import Image
+    splash = ctk.CTk()
+    splash.attributes('-transparentcolor', 'gray')
+    splash.wm_attributes("-topmost", True)
+    pic = Image.open(app_logo)
+    splash_width = int(round(pic.width / 2)) 
+    splash_height = int(round(pic.height / 2)) 
+    splash.overrideredirect(True)
+    logo = ctk.CTkImage(light_image=pic, dark_image=pic, size=(splash_width, splash_height)) 
+    image = ctk.CTkLabel(splash, text="", image=logo, bg_color="gray")
+    image.pack(padx=0, pady=0)
+
+    # Center the window on the screen (might require adjustments based on CTk window manager handling)
+    center_x = ((screen_width - int(splash_width)) // 2) + x
+    center_y = ((screen_height - int(splash_height)) // 2) + y 
+    splash.geometry(f"{splash_width}x{splash_height}+{center_x}+{center_y}")  # Set geometry with position
+
+    # destroy app splash as soon as the background warm up has finished, or after 5 seconds at most
+    deadline = time.monotonic() + 5
+    def close_when_ready():
+        if not warming_up.is_alive() or time.monotonic() >= deadline:
+            splash.quit()
+        else:
+            splash.after(50, close_when_ready)
+    splash.after(50, close_when_ready)
+    splash.mainloop()
+    splash.destroy()
+
+def exit_program():
+    # Stop the scan scheduler if it's running
+    if scheduler:
+        scheduler.stop()
+    if notification_dispatcher:
+        notification_dispatcher.stop()
+    notification_ledger.close()
+
+    # Close any pooled database connections
+    connection_pool.close_all()
+
+    # Exit the program
+    sys.exit()
+
+def main():
+    global scheduler, notification_dispatcher
+    # Extract the scan interval value from settings
+    scan_interval = settings_store.scan_interval  # Defaults to 3 hours
+
+    # Keep pooled connections open across scan cycles
+    connection_pool.idle_timeout = max(connection_pool.idle_timeout, 2 * scan_interval)
+
+    # Make sure at least one database is set up (this may ask the user) before scanning in the background
+    load_settings("Databases", None)
+
+    # Start showing notifications before the first scan queues any
+    notification_dispatcher = NotificationDispatcher(WindowsToastBackend(), settings_store.notify_gap, settings_store.notify_queue)
+    notification_dispatcher.start()
+
+    # Start the scheduler, it scans straight away and then whenever a product changes state or the scan interval passes
+    scheduler = ExpiryScheduler(scheduled_scan)
+    scheduler.start()
+
+def scheduled_scan():
+    # The scheduler's scans, the first one completes the startup timings (even with no databases to scan)
+    next_change = trigger_database_scan(settings_store.databases)
+    startup_timer.mark("first_scan_result")
+    return next_change
+
+if __name__ == "__main__":
+    # Profile startup (up to the scheduler starting) when profiling is turned on
+    startup_profile = start_profile()
+
+    # Time each startup phase, saved to STARTUP_LOG once the tray is up and the first scan result is in
+    startup_timer = PhaseTimer(STARTUP_LOG, ("tray_icon_shown", "splash_closed", "first_scan_result"))
+
+    # Warm up settings, database connections and the first scan in the background while the tray and splash are created
+    warming_up = threading.Thread(target=warm_up, args=(startup_timer,), daemon=True)
+    warming_up.start()
+
+    # begin creating main app
+    app = QApplication(sys.argv)
+
+    # Create a system tray icon
+    tray_icon = QSystemTrayIcon()
+    tray_icons = {state: QIcon(path) for state, path in TRAY_ICONS.items()}
+    tray_icon.setIcon(tray_icons["ok"])
+    tray_icon.setToolTip("IMPP")
+
+    # Create a context menu for the system tray icon
+    tray_menu = QMenu()
+    soonest_menu = tray_menu.addMenu("Next to Expire") # filled in after each scan
+    soonest_menu.addAction("Scanning...").setEnabled(False)
+    tray_signals = TraySignals()
+    tray_signals.soonest_changed.connect(update_soonest_menu)
+    tray_signals.state_changed.connect(update_tray_state)
+    scan_action = QAction("Scan Databases Now...", parent=app)
+    scan_action.triggered.connect(lambda: scheduler.wake())
+    tray_menu.addAction(scan_action)
+    database_editor = QAction("Database Editor", parent=app)
+    database_editor.triggered.connect(show_editor_window)
+    tray_menu.addAction(database_editor)
+    pause_notifications_action = QAction("Pause Notifications for 24 Hours", parent=app)
+    pause_notifications_action.triggered.connect(pause_notifications_24h)
+    tray_menu.addAction(pause_notifications_action)
+    settings_action = QAction("Settings", parent=app)
+    settings_action.triggered.connect(show_settings_window)
+    tray_menu.addAction(settings_action)
+    exit_action = QAction("Exit", parent=app)
+    exit_action.triggered.connect(exit_program)
+    tray_menu.addAction(exit_action)
+
+    # Connect the activated signal to the tray_icon_double_clicked function
+    tray_icon.activated.connect(tray_icon_double_clicked)
+
+    # Set the tray menu for the system tray icon
+    tray_icon.setContextMenu(tray_menu)
+    tray_icon.show()
+    startup_timer.mark("tray_icon_shown")
+
+    # Show the splash until the warm up has finished
+    import screeninfo
+    for monitor in screeninfo.get_monitors():
+        if monitor.is_primary:
+            splash(monitor.width, monitor.height, monitor.x, monitor.y, warming_up)
+    startup_timer.mark("splash_closed")
+
+    # Run the main function
+    main()
+    if startup_profile:
+        save_profile(startup_profile, "startup")
+
+    app.exec_()
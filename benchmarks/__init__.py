@@ -0,0 +1,2 @@
+# Benchmarks for IMPP - generator.py builds synthetic lab databases, run.py runs the suite and saves the timings as JSON,
+# and the bench_*.py scripts each look at one optimisation in more detail
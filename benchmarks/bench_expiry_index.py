@@ -0,0 +1,63 @@
+# Benchmark the scanner query on a large products database before and after the expiry_date index migration
+# usage: python benchmarks/bench_expiry_index.py [--rows 1000000] [--repeat 5]
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from impp_core import SCAN_QUERY, migrate_database
+from benchmarks.generator import generate_database
+
+def time_query(conn, query, params, repeat):
+    # Best of `repeat` runs, in milliseconds, plus the number of rows returned
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(conn.execute(query, params).fetchall())
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, found
+
+def run_scan_query(conn, repeat, notify_days):
+    today = datetime.now().date()
+    later = today + timedelta(days=notify_days)
+    params = {"today": today.strftime("%Y-%m-%d"), "later": later.strftime("%Y-%m-%d")}
+    plan = " / ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + SCAN_QUERY, params))
+    best, found = time_query(conn, SCAN_QUERY, params, repeat)
+    print(f"  scan {best:9.2f} ms  {found:>8} rows  [{plan}]")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the scanner query before and after the expiry_date index migration.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--notify-days", type=int, default=14)
+    parser.add_argument("--expired-fraction", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        start = time.perf_counter()
+        generate_database(db_path, args.rows, "uniform", args.expired_fraction, schema_version=1) # unindexed, as before the migration
+        print(f"Generated {args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+        conn = sqlite3.connect(db_path)
+        print("Before migration (no index):")
+        before = run_scan_query(conn, args.repeat, args.notify_days)
+
+        start = time.perf_counter()
+        version = migrate_database(conn)
+        print(f"Migrated to schema version {version} in {time.perf_counter() - start:.1f} s")
+
+        print("After migration:")
+        after = run_scan_query(conn, args.repeat, args.notify_days)
+        conn.close()
+
+    print(f"Scan query {before / after:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Benchmark bulk importing a large delivery manifest, then importing it again when every row is a duplicate
+# usage: python benchmarks/bench_import.py [--rows 1000000] [--batch-size 5000]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import impp_core
+from benchmarks.generator import generate_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Time bulk imports of a generated CSV manifest.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        manifest = os.path.join(workdir, "manifest.csv")
+        db_path = os.path.join(workdir, "bench.db")
+        start = time.perf_counter()
+        generate_manifest(manifest, args.rows)
+        print(f"Generated {args.rows} row manifest ({os.path.getsize(manifest) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f} s")
+        impp_core.create_database(db_path)
+
+        print("First import:  ", impp_core.import_products(db_path, manifest, args.batch_size))
+        print("Second import: ", impp_core.import_products(db_path, manifest, args.batch_size))
+        impp_core.connection_pool.close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Benchmark sequential against parallel scanning of many databases, some of which are slow (e.g. on a network share)
+# usage: python benchmarks/bench_parallel_scan.py [--databases 200] [--rows 2000] [--workers 8]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import impp_core
+from benchmarks.generator import generate_lab
+
+def inject_latency(slow_paths, latency):
+    # Wrap scan_database so the chosen databases take `latency` seconds longer, like a database on a slow share
+    scan_database = impp_core.scan_database
+
+    def slow_scan_database(db_path, notify_days, name=None):
+        if db_path in slow_paths:
+            time.sleep(latency)
+        return scan_database(db_path, notify_days, name)
+
+    impp_core.scan_database = slow_scan_database
+
+def time_scan(database_settings, notify_days, workers):
+    impp_core.scan_cache.invalidate() # time real scans, not unchanged databases being skipped
+    start = time.perf_counter()
+    order = [name for name, products, next_change, error in impp_core.scan_databases(database_settings, notify_days, workers)]
+    elapsed = time.perf_counter() - start
+    assert order == list(database_settings), "results came back out of settings order"
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and parallel wall-clock time for scanning many databases.")
+    parser.add_argument("--databases", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="fraction of databases given extra latency")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds of latency added to slow databases")
+    parser.add_argument("--notify-days", type=int, default=14)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as workdir:
+        database_settings = generate_lab(workdir, args.databases, args.rows, "uniform")
+        slow_paths = set(rng.sample(sorted(database_settings.values()), int(args.databases * args.slow_fraction)))
+        inject_latency(slow_paths, args.latency)
+        print(f"Generated {args.databases} databases of {args.rows} rows, {len(slow_paths)} with {args.latency * 1000:.0f} ms extra latency")
+
+        time_scan(database_settings, args.notify_days, args.workers) # warm the connection pool and page cache
+        sequential = time_scan(database_settings, args.notify_days, 1)
+        parallel = time_scan(database_settings, args.notify_days, args.workers)
+        impp_core.connection_pool.close_all()
+
+    print(f"Sequential (1 worker):   {sequential * 1000:8.1f} ms")
+    print(f"Parallel ({args.workers} workers):  {parallel * 1000:8.1f} ms")
+    print(f"Speedup: {sequential / parallel:.1f}x")
+
+if __name__ == "__main__":
+    main()
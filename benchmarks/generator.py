@@ -0,0 +1,94 @@
+# Synthetic lab databases for benchmarks - reagent style product names, configurable row and database counts and
+# expiry date distributions. Everything is seeded so the same arguments always build the same databases.
+import csv
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import impp_core
+
+REAGENTS = ["Sodium Chloride", "Potassium Chloride", "Tris Base", "Glycine", "Agarose", "Ethanol", "Methanol",
+            "Taq Polymerase", "dNTP Mix", "MgCl2 Solution", "PBS Tablets", "Trypsin-EDTA", "Foetal Bovine Serum",
+            "DMEM", "RPMI 1640", "Penicillin-Streptomycin", "SYBR Safe", "Proteinase K", "RNase A", "DNA Ladder",
+            "Bradford Reagent", "Tween 20", "Triton X-100", "SDS", "Acrylamide", "TEMED", "Ampicillin", "Kanamycin",
+            "LB Broth", "Glycerol", "HEPES", "EDTA", "Isopropanol", "Chloroform", "Phenol", "Hydrochloric Acid"]
+PACK_SIZES = ["500 mL", "1 L", "2.5 L", "100 g", "500 g", "25 g", "10 x 1 mL", "100 rxn", "kit"]
+EXPIRY_DISTRIBUTIONS = ("uniform", "realistic", "clustered")
+
+def product_name(rng):
+    return f"{rng.choice(REAGENTS)} {rng.choice(PACK_SIZES)} (cat. {rng.randint(10000, 99999)})"
+
+def expiry_dates(rng, distribution, expired_fraction):
+    # Endless expiry dates following one of EXPIRY_DISTRIBUTIONS:
+    #   uniform   - spread evenly over the next two years
+    #   realistic - most stock expires 6 to 18 months out with a tail either side, like a working lab
+    #   clustered - deliveries of 5 to 50 products sharing a date, the worst case for sorting and paging on ties
+    today = datetime.now().date()
+    while True:
+        if distribution == "clustered":
+            batch = rng.randint(5, 50)
+        else:
+            batch = 1
+        if rng.random() < expired_fraction:
+            days = -rng.randint(1, 90)
+        elif distribution == "uniform":
+            days = rng.randint(0, 730)
+        else:
+            days = max(0, int(rng.triangular(0, 1095, 365)))
+        expiry = (today + timedelta(days=days)).strftime("%Y-%m-%d")
+        for _ in range(batch):
+            yield expiry
+
+def generate_products(rows, distribution="realistic", expired_fraction=0.05, seed=42):
+    # Yields (name, expiry_date) for `rows` products
+    if distribution not in EXPIRY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown expiry distribution \"{distribution}\", use one of {', '.join(EXPIRY_DISTRIBUTIONS)}.")
+    rng = random.Random(seed)
+    dates = expiry_dates(rng, distribution, expired_fraction)
+    for _ in range(rows):
+        yield (product_name(rng), next(dates))
+
+def generate_database(db_path, rows, distribution="realistic", expired_fraction=0.05, seed=42, schema_version=None):
+    # Build a products database at db_path. Rows are inserted before the indexes are built (quicker than keeping them
+    # up to date row by row), then it is migrated to schema_version, or the latest schema if None
+    conn = sqlite3.connect(db_path)
+    conn.execute(impp_core.SCHEMA_MIGRATIONS[0])
+    conn.execute("PRAGMA user_version = 1")
+    with conn:
+        conn.executemany("INSERT INTO products (name, expiry_date) VALUES (?, ?)",
+                         generate_products(rows, distribution, expired_fraction, seed))
+    if schema_version is None:
+        impp_core.migrate_database(conn)
+    else:
+        with conn:
+            for migration in impp_core.SCHEMA_MIGRATIONS[1:schema_version]:
+                for statement in (migration if isinstance(migration, tuple) else (migration,)):
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {schema_version}")
+    conn.close()
+
+def generate_lab(workdir, databases, rows, distribution="realistic", expired_fraction=0.05, seed=42):
+    # Build `databases` databases of `rows` products each in workdir and return them as settings ({name: path})
+    database_settings = {}
+    for number in range(databases):
+        db_path = os.path.join(workdir, f"lab{number}.db")
+        generate_database(db_path, rows, distribution, expired_fraction, seed + number)
+        database_settings[f"Lab {number}"] = db_path
+    return database_settings
+
+def generate_manifest(file_path, rows, seed=42):
+    # Supplier style CSV delivery manifest with a header, day first dates and the odd bad row
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    with open(file_path, "w", newline="") as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(["Product", "Lot", "Expiry Date"])
+        for number in range(rows):
+            expiry = today + timedelta(days=rng.randint(0, 730))
+            expiry_text = expiry.strftime("%d/%m/%Y") if number % 2 else expiry.strftime("%Y-%m-%d")
+            if number % 1000 == 999:
+                expiry_text = "TBC"
+            writer.writerow([f"Reagent {number}", f"LOT{rng.randint(1000, 9999)}", expiry_text])
@@ -0,0 +1,185 @@
+# Run the benchmark suite against generated lab databases and save the timings as JSON so runs can be compared over time
+# usage: python benchmarks/run.py [--databases 20] [--rows 20000] [--distribution realistic] [--repeat 5]
+#                                 [--output results.json] [--compare earlier.json]
+# The tray app benchmarks (trigger_database_scan, load_settings/write_settings, editor fetch_data) import IMPP.py, so they
+# need its GUI libraries installed. Toasts go to a recording backend and the tray icon is replaced with a stub, nothing is shown on screen.
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import impp_core
+from benchmarks.generator import EXPIRY_DISTRIBUTIONS, generate_lab
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def measure(function, repeat, before_each=None):
+    # Time `repeat` calls of function (after one untimed warm up call), in milliseconds
+    if before_each:
+        before_each()
+    result = function()
+    runs = []
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        result = function()
+        runs.append((time.perf_counter() - start) * 1000)
+    timings = {"best_ms": min(runs), "median_ms": statistics.median(runs), "mean_ms": statistics.mean(runs), "runs": repeat}
+    if isinstance(result, (list, dict)):
+        timings["rows"] = len(result)
+    return timings
+
+def bench_scanner(database_settings, args):
+    # DatabaseScanner's queries on one database
+    scanner = impp_core.DatabaseScanner(next(iter(database_settings.values())))
+    try:
+        return {"scanner.scan": measure(lambda: scanner.scan(args.notify_days), args.repeat),
+                "scanner.next_change": measure(lambda: scanner.next_change(args.notify_days), args.repeat),
+                "scanner.change_token": measure(lambda: scanner.change_token(args.notify_days), args.repeat)}
+    finally:
+        scanner.close()
+
+def bench_scan_databases(database_settings, args):
+    # Every database, both scan methods, with the scan cache emptied so each run really reads the databases
+    results = {}
+    for method in ("parallel", "attach"):
+        results[f"scan_databases.{method}"] = measure(
+            lambda: list(impp_core.scan_databases(database_settings, args.notify_days, args.workers, method)),
+            args.repeat, before_each=impp_core.scan_cache.invalidate)
+    results["scan_databases.parallel_cached"] = measure(
+        lambda: list(impp_core.scan_databases(database_settings, args.notify_days, args.workers)), args.repeat)
+    return results
+
+def bench_editor_pages(database_settings, args):
+    pager = impp_core.ProductPager(next(iter(database_settings.values())), "expiry", args.page_size)
+    middle = pager.first_page()[-1]
+    return {"pager.first_page": measure(pager.first_page, args.repeat),
+            "pager.page_after": measure(lambda: pager.page_after(middle), args.repeat),
+            "pager.page_before": measure(lambda: pager.page_before(middle), args.repeat)}
+
+def bench_search(database_settings, args):
+    db_path = next(iter(database_settings.values()))
+    return {"search.prefix": measure(lambda: impp_core.search_products(db_path, "sod"), args.repeat),
+            "search.words": measure(lambda: impp_core.search_products(db_path, "taq polymerase"), args.repeat),
+            "search.all_databases": measure(lambda: impp_core.search_attached_databases(database_settings, "taq polymerase"), args.repeat)}
+
+class StubTray:
+    # Stands in for the tray icon and its signals so a scan can run end to end without Qt
+    def __init__(self):
+        self.soonest_changed = self.state_changed = self
+    def setIcon(self, icon):
+        pass
+    def setToolTip(self, tip):
+        pass
+    def emit(self, *args):
+        pass
+
+class StubEditor:
+    # The parts of DatabaseEditor that fetch_data uses
+    sort_order = "expiry"
+
+def bench_tray_app(database_settings, args):
+    import IMPP # needs the GUI libraries, skipped (with the reason saved in the results) if they aren't installed
+    IMPP.notification_dispatcher = impp_core.NotificationDispatcher(impp_core.RecordingBackend(), gap=0, queue_size=1000)
+    IMPP.notification_dispatcher.start()
+    IMPP.tray_icon = IMPP.tray_signals = StubTray()
+    IMPP.settings_store = impp_core.settings_store
+    results = {"trigger_database_scan": measure(lambda: IMPP.trigger_database_scan(database_settings), args.repeat,
+                                                before_each=impp_core.scan_cache.invalidate),
+               "trigger_database_scan.cached": measure(lambda: IMPP.trigger_database_scan(database_settings), args.repeat),
+               "load_settings": measure(lambda: IMPP.load_settings("Databases", None), args.repeat),
+               "write_settings": measure(lambda: IMPP.write_settings("Notifications", "scan_interval", "10800"), args.repeat)}
+
+    IMPP.db_location = next(iter(database_settings.values()))
+    editor = StubEditor()
+    results["editor.fetch_data"] = measure(lambda: IMPP.DatabaseEditor.fetch_data(editor), args.repeat)
+    return results
+
+BENCHMARKS = {"scanner": bench_scanner, "scan_databases": bench_scan_databases, "editor_pages": bench_editor_pages,
+              "search": bench_search, "tray_app": bench_tray_app}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, earlier_path):
+    # Print each benchmark's median against the same benchmark in an earlier results file
+    with open(earlier_path) as earlier_file:
+        earlier = json.load(earlier_file)["results"]
+    print(f"\nCompared with {earlier_path}:")
+    for name, timings in results.items():
+        before = earlier.get(name, {}).get("median_ms")
+        if before and "median_ms" in timings:
+            print(f"  {name:34} {before:9.2f} ms -> {timings['median_ms']:9.2f} ms  ({before / timings['median_ms']:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the IMPP benchmark suite and save the timings as JSON.")
+    parser.add_argument("--databases", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=20000, help="products in each database")
+    parser.add_argument("--distribution", choices=EXPIRY_DISTRIBUTIONS, default="realistic", help="expiry date distribution")
+    parser.add_argument("--expired-fraction", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--notify-days", type=int, default=14)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="only run these benchmarks")
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<date and time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    started = datetime.now()
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        database_settings = generate_lab(workdir, args.databases, args.rows, args.distribution, args.expired_fraction, args.seed)
+        print(f"Generated {args.databases} databases of {args.rows} products in {time.perf_counter() - start:.1f} s")
+
+        # settings and relative paths (settings.ini) are kept in the temporary folder, away from any real settings
+        working_folder = os.getcwd()
+        os.chdir(workdir)
+        impp_core.settings_store = impp_core.SettingsStore(impp_core.SETTINGS)
+        for name, db_path in database_settings.items():
+            impp_core.settings_store.set("Databases", name, db_path)
+        try:
+            for group, benchmark in BENCHMARKS.items():
+                if args.only and group not in args.only:
+                    continue
+                try:
+                    group_results = benchmark(database_settings, args)
+                except ImportError as error:
+                    print(f"{group}: skipped ({error})")
+                    results[group] = {"skipped": str(error)}
+                    continue
+                for name, timings in group_results.items():
+                    print(f"  {name:34} best {timings['best_ms']:9.2f} ms  median {timings['median_ms']:9.2f} ms")
+                results.update(group_results)
+        finally:
+            impp_core.connection_pool.close_all()
+            os.chdir(working_folder)
+
+    report = {"started": started.isoformat(timespec="seconds"), "commit": git_commit(), "python": platform.python_version(),
+              "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "parameters": vars(args), "results": results}
+    output = args.output or os.path.join(RESULTS_FOLDER, started.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
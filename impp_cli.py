@@ -0,0 +1,207 @@
+# Command line interface for IMPP - scans and lists databases without loading any GUI toolkit, so it runs under
+# cron / Task Scheduler and on servers without a display.
+# usage: python impp_cli.py [--settings settings.ini] scan [--json]
+#        python impp_cli.py [--settings settings.ini] list [DATABASE] [--json]
+#        python impp_cli.py [--settings settings.ini] import DATABASE FILE [--batch-size 5000]
+#        python impp_cli.py [--settings settings.ini] export {products,scan} [--database NAME] [--format csv|jsonl|parquet] [--output FILE]
+#        python impp_cli.py [--settings settings.ini] compact DATABASE [DATABASE ...]
+#        python impp_cli.py profile-report [--folder profiles] [--name scan] [--top 25]
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import impp_core
+
+def scan_command(args):
+    database_settings = impp_core.settings_store.databases
+    if not database_settings:
+        print("No databases configured, add one in IMPP settings first.", file=sys.stderr)
+        return 1
+
+    notify_days = impp_core.settings_store.notify_days
+    cycle_start = time.perf_counter()
+    results = []
+    failed = False
+    for name, products, next_change, error in impp_core.scan_databases(database_settings, notify_days, impp_core.settings_store.scan_workers,
+                                                                           impp_core.settings_store.scan_method):
+        failed = failed or error is not None
+        results.append({
+            "name": name,
+            "path": database_settings[name],
+            "error": str(error) if error else None,
+            "next_change": next_change,
+            "products": [{"id": id, "name": product, "expiry_date": expiry_date, "days_left": days_left, "status": status}
+                         for id, product, expiry_date, days_left, status in products],
+        })
+
+    # save the scan metrics for node exporter, if a textfile has been set in the settings
+    impp_core.scan_metrics.cycle(time.perf_counter() - cycle_start)
+    if impp_core.settings_store.metrics_textfile:
+        try:
+            impp_core.scan_metrics.write_textfile(impp_core.settings_store.metrics_textfile)
+        except OSError as error:
+            print(f"Could not write metrics to {impp_core.settings_store.metrics_textfile}: {error}", file=sys.stderr)
+
+    if args.json:
+        json.dump({"scanned": datetime.now().isoformat(timespec="seconds"), "notify_days": notify_days, "databases": results}, sys.stdout, indent=2)
+        print()
+    else:
+        for result in results:
+            if result["error"]:
+                print(f"{result['name']}: could not be scanned ({result['error']})")
+                continue
+            expired = sum(1 for product in result["products"] if product["status"] == "expired")
+            print(f"{result['name']}: {expired} expired, {len(result['products']) - expired} expiring in the next {notify_days} days")
+            for product in result["products"]:
+                if product["status"] == "expired":
+                    print(f"    {product['expiry_date']}  {product['name']} (expired)")
+                else:
+                    print(f"    {product['expiry_date']}  {product['name']} (in {product['days_left']} days)")
+    return 1 if failed else 0
+
+def list_command(args):
+    database_settings = impp_core.settings_store.databases
+    if args.database is None: # list the configured databases
+        if args.json:
+            json.dump([{"name": name, "path": path} for name, path in database_settings.items()], sys.stdout, indent=2)
+            print()
+        else:
+            for name, path in database_settings.items():
+                print(f"{name}\t{path}")
+        return 0
+
+    if args.database not in database_settings:
+        print(f"No database called \"{args.database}\" in {impp_core.settings_store.path}", file=sys.stderr)
+        return 1
+    with impp_core.connection_pool.connection(database_settings[args.database]) as conn:
+        products = conn.execute("SELECT id, name, expiry_date FROM products ORDER BY expiry_date, id").fetchall()
+    if args.json:
+        json.dump([{"id": id, "name": name, "expiry_date": expiry_date} for id, name, expiry_date in products], sys.stdout, indent=2)
+        print()
+    else:
+        for id, name, expiry_date in products:
+            print(f"{expiry_date}  {name}")
+    return 0
+
+def import_command(args):
+    database_settings = impp_core.settings_store.databases
+    if args.database not in database_settings:
+        print(f"No database called \"{args.database}\" in {impp_core.settings_store.path}", file=sys.stderr)
+        return 1
+    try:
+        report = impp_core.import_products(database_settings[args.database], args.file, args.batch_size)
+    except (OSError, ValueError, csv.Error, sqlite3.Error) as error:
+        print(f"Import failed: {error}", file=sys.stderr)
+        return 1
+    print(report)
+    return 0
+
+def export_command(args):
+    database_settings = impp_core.settings_store.databases
+    if args.database:
+        if args.database not in database_settings:
+            print(f"No database called \"{args.database}\" in {impp_core.settings_store.path}", file=sys.stderr)
+            return 1
+        database_settings = {args.database: database_settings[args.database]}
+    if args.format == "parquet" and not args.output:
+        print("Parquet exports need --output FILE", file=sys.stderr)
+        return 1
+
+    rows = impp_core.export_rows(database_settings, args.kind, impp_core.settings_store.notify_days)
+    columns = impp_core.EXPORT_COLUMNS[args.kind]
+    try:
+        if args.format == "parquet":
+            count = impp_core.write_export(rows, columns, args.format, args.output)
+        elif args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as output:
+                count = impp_core.write_export(rows, columns, args.format, output)
+        else:
+            count = impp_core.write_export(rows, columns, args.format, sys.stdout)
+    except (OSError, ValueError, sqlite3.Error) as error:
+        print(f"Export failed: {error}", file=sys.stderr)
+        return 1
+    print(f"Exported {count} rows", file=sys.stderr)
+    return 0
+
+def compact_command(args):
+    database_settings = impp_core.settings_store.databases
+    failed = False
+    for name in args.databases:
+        if name not in database_settings:
+            print(f"No database called \"{name}\" in {impp_core.settings_store.path}", file=sys.stderr)
+            failed = True
+            continue
+        try:
+            products = impp_core.compact_database(database_settings[name])
+        except (ValueError, sqlite3.Error) as error:
+            print(f"{name}: not compacted ({error})", file=sys.stderr)
+            failed = True
+            continue
+        print(f"{name}: {products} products converted to compact storage")
+    return 1 if failed else 0
+
+def profile_report_command(args):
+    # Slowest functions over every profile saved while profiling was turned on
+    try:
+        stats, count = impp_core.profile_report(args.folder, args.name)
+    except FileNotFoundError:
+        stats, count = None, 0
+    if stats is None:
+        print(f"No profiles found in {args.folder}, turn profiling on in IMPP settings or set IMPP_PROFILE=1", file=sys.stderr)
+        return 1
+    print(f"{count} profiles in {args.folder}")
+    stats.print_stats(args.top)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="impp", description="Scan and list IMPP product databases.")
+    parser.add_argument("--settings", default=impp_core.SETTINGS, help="settings file to use (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser("scan", help="scan every configured database for expired and soon to expire products")
+    scan.add_argument("--json", action="store_true", help="print the scan result as JSON")
+    scan.set_defaults(run=scan_command)
+
+    listing = commands.add_parser("list", help="list configured databases, or the products in one database")
+    listing.add_argument("database", nargs="?", help="name of the database to list products from")
+    listing.add_argument("--json", action="store_true", help="print the list as JSON")
+    listing.set_defaults(run=list_command)
+
+    importing = commands.add_parser("import", help="bulk import products from a CSV or Excel delivery manifest")
+    importing.add_argument("database", help="name of the database to import into")
+    importing.add_argument("file", help="CSV or .xlsx file with product name and expiry date columns")
+    importing.add_argument("--batch-size", type=int, default=5000, help="rows inserted per transaction (default: %(default)s)")
+    importing.set_defaults(run=import_command)
+
+    exporting = commands.add_parser("export", help="export products, or the current scan result, from the configured databases")
+    exporting.add_argument("kind", choices=sorted(impp_core.EXPORT_COLUMNS), help="what to export")
+    exporting.add_argument("--database", help="only export this database (default: all of them)")
+    exporting.add_argument("--format", choices=impp_core.EXPORT_FORMATS, default="csv", help="file format (default: %(default)s)")
+    exporting.add_argument("--output", help="file to write (default: standard output)")
+    exporting.set_defaults(run=export_command)
+
+    compacting = commands.add_parser("compact", help="store expiry dates as day numbers, older readers keep working through a view")
+    compacting.add_argument("databases", nargs="+", metavar="DATABASE", help="name of a database to convert")
+    compacting.set_defaults(run=compact_command)
+
+    profiles = commands.add_parser("profile-report", help="summarise the slowest functions in saved performance profiles")
+    profiles.add_argument("--folder", default=impp_core.PROFILE_FOLDER, help="folder the profiles were saved in (default: %(default)s)")
+    profiles.add_argument("--name", help="only profiles of this kind, e.g. scan, startup, editor_fetch_data")
+    profiles.add_argument("--top", type=int, default=25, help="functions to list (default: %(default)s)")
+    profiles.set_defaults(run=profile_report_command)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    impp_core.settings_store = impp_core.SettingsStore(args.settings)
+    try:
+        return args.run(args)
+    finally:
+        impp_core.connection_pool.close_all()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1502 @@
+# Headless core of IMPP - settings, database schema, connections and scanning. Nothing in here imports a GUI toolkit
+# so it can be used by the command line (impp_cli.py), benchmarks and scripts on machines without a display
+import sqlite3
+from datetime import date, datetime, timedelta
+import os
+import configparser
+import threading
+import time
+import queue
+import json
+import re
+import cProfile
+import pstats
+import functools
+import heapq
+import csv
+from urllib.parse import quote
+from itertools import chain, islice
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration files
+SETTINGS = "settings.ini"
+STARTUP_LOG = "startup_timings.jsonl" # one line of startup phase timings per launch
+PROFILE_FOLDER = "profiles" # profiler dumps and summaries, when profiling is turned on
+NOTIFICATION_LEDGER = "notified.db" # which products have already been notified, see NotificationLedger
+
+# Settings used when settings.ini doesn't contain them yet
+DEFAULT_SETTINGS = {
+    "Notifications": {"scan_interval": "10800", "notify_days": "14",
+                      "summary_items": "5", # products listed by name in each summary notification
+                      "max_notifications": "6", # summary notifications shown per scan
+                      "notify_gap": "2", # seconds between notifications, so a burst doesn't flood the screen
+                      "notify_queue": "20", # notifications waiting to be shown before the oldest are dropped
+                      "remind_after": "86400"}, # seconds before a product still expired or due is notified again, 0 for never
+    "Scanning": {"scan_workers": "4", # number of databases scanned at the same time
+                 "scan_method": "parallel"}, # "parallel" scans each database on its own connection, "attach" reads them all with ATTACH
+    "Metrics": {"textfile": ""}, # Prometheus textfile (*.prom) scan metrics are written to after every scan, blank for none
+    "Profiling": {"enabled": "no", # profile scans, the editor and startup (or set the IMPP_PROFILE environment variable)
+                  "keep": "50"}, # newest profiles kept, older ones are deleted
+}
+
+# Database schema - each entry upgrades a database by one version, tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    # 1: products table
+    '''CREATE TABLE IF NOT EXISTS products
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        expiry_date DATE NOT NULL)''',
+    # 2: index expiry dates so scans are index range scans rather than full table scans
+    '''CREATE INDEX IF NOT EXISTS idx_products_expiry_date ON products (expiry_date)''',
+    # 3: index names so the editor can page through products in name order
+    '''CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)''',
+    # 4: full text index of product names for the editor's search box, kept in step with products by triggers
+    ("""CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5
+        (name, content='products', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+     """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+        END""",
+     """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+     """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO products_fts (rowid, name) VALUES (new.id, new.name);
+        END""",
+     """INSERT INTO products_fts (products_fts) VALUES ('rebuild')"""), # index the products already in the database
+]
+
+# Scanner query - reads everything expiring up to the end of the notify window in one pass
+# and labels each row as "expired" or "upcoming" with its days until expiry.
+# {schema} is "" for a database on its own, or the name of an attached database followed by "."
+SCAN_TEMPLATE = '''SELECT id, name, expiry_date,
+                     CAST(julianday(expiry_date) - julianday(:today) AS INTEGER) AS days_left,
+                     CASE WHEN expiry_date < :today THEN 'expired' ELSE 'upcoming' END AS status
+              FROM {schema}products WHERE expiry_date <= :later ORDER BY expiry_date'''
+SCAN_QUERY = SCAN_TEMPLATE.format(schema="")
+
+# Search query - best matches first (bm25 rank), soonest expiry first between equally good matches
+SEARCH_QUERY = '''SELECT products.id, products.name, products.expiry_date
+                FROM products_fts JOIN products ON products.id = products_fts.rowid
+                WHERE products_fts MATCH ? ORDER BY products_fts.rank, products.expiry_date LIMIT ?'''
+
+# Next date any product changes state - the first product beyond the notify window enters it,
+# or the first product that hasn't expired yet expires
+NEXT_CHANGE_TEMPLATE = '''SELECT MIN(change) FROM
+                      (SELECT date(MIN(expiry_date), '-' || :notify_days || ' days') AS change FROM {schema}products WHERE expiry_date > :later
+                       UNION ALL
+                       SELECT date(MIN(expiry_date), '+1 day') FROM {schema}products WHERE expiry_date >= :today)'''
+NEXT_CHANGE_QUERY = NEXT_CHANGE_TEMPLATE.format(schema="")
+
+# Queries run against every attached database at once (see AttachedDatabases), each row tagged with {database},
+# the name of the database it came from
+ATTACHED_SCAN_QUERY = "SELECT {database} AS database, * FROM (" + SCAN_TEMPLATE + ")"
+ATTACHED_NEXT_CHANGE_QUERY = "SELECT {database} AS database, (" + NEXT_CHANGE_TEMPLATE + ") AS next_change"
+ATTACHED_PAGE_QUERY = '''SELECT * FROM (SELECT id, name, expiry_date, {database} AS database FROM {schema}products {where}
+                                       ORDER BY {column} {direction}, id {direction} LIMIT :limit)'''
+ATTACHED_SEARCH_QUERY = '''SELECT * FROM (SELECT products.id, products.name, products.expiry_date, {database} AS database, products_fts.rank AS rank
+                                         FROM {schema}products_fts JOIN {schema}products ON products.id = products_fts.rowid
+                                         WHERE products_fts MATCH :terms ORDER BY products_fts.rank LIMIT :limit)'''
+ATTACHED_LIKE_QUERY = '''SELECT * FROM (SELECT id, name, expiry_date, {database} AS database FROM {schema}products
+                                       WHERE name LIKE :pattern ESCAPE '\\' ORDER BY name, id LIMIT :limit)'''
+# The soonest products still to expire in one database, read in order straight off the expiry date index
+SOONEST_QUERY = '''SELECT id, name, expiry_date FROM products WHERE expiry_date >= :today ORDER BY expiry_date, id LIMIT :limit'''
+# Compact storage (see compact_database) keeps expiry dates as whole day numbers since 1970-01-01 in products_compact,
+# with a products view on top showing them as dates again so anything reading or writing products still works.
+# Comparing and subtracting day numbers needs no date parsing at all.
+EPOCH = date(1970, 1, 1)
+UNREADABLE_DAY = -10**6 # day number ScanResult sorts expired products with an unreadable expiry date under, long before any real one
+DATE_TO_DAY = "CAST(julianday({date}) - 2440587.5 AS INTEGER)"
+DAY_TO_DATE = "date({day} * 86400, 'unixepoch')"
+COMPACT_SCAN_QUERY = '''SELECT id, name, ''' + DAY_TO_DATE.format(day="expiry_day") + ''' AS expiry_date,
+                             expiry_day - :today_day AS days_left,
+                             CASE WHEN expiry_day < :today_day THEN 'expired' ELSE 'upcoming' END AS status
+                      FROM products_compact WHERE expiry_day <= :later_day ORDER BY expiry_day'''
+COMPACT_NEXT_CHANGE_QUERY = '''SELECT ''' + DAY_TO_DATE.format(day="MIN(change)") + ''' FROM
+                              (SELECT MIN(expiry_day) - :notify_days AS change FROM products_compact WHERE expiry_day > :later_day
+                               UNION ALL
+                               SELECT MIN(expiry_day) + 1 FROM products_compact WHERE expiry_day >= :today_day)'''
+COMPACT_SOONEST_QUERY = '''SELECT id, name, ''' + DAY_TO_DATE.format(day="expiry_day") + ''' FROM products_compact
+                          WHERE expiry_day >= :today_day ORDER BY expiry_day, id LIMIT :limit'''
+COMPACT_STORAGE = [
+    '''CREATE TABLE products_compact
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        expiry_day INTEGER NOT NULL)''',
+    "INSERT INTO products_compact (id, name, expiry_day) SELECT id, name, " + DATE_TO_DAY.format(date="expiry_date") + " FROM products",
+    "DROP TABLE products", # its indexes and triggers go with it
+    "CREATE INDEX idx_products_compact_expiry_day ON products_compact (expiry_day)",
+    "CREATE INDEX idx_products_compact_name ON products_compact (name)",
+    "CREATE VIEW products AS SELECT id, name, " + DAY_TO_DATE.format(day="expiry_day") + " AS expiry_date FROM products_compact",
+    '''CREATE TRIGGER products_insert INSTEAD OF INSERT ON products BEGIN
+       INSERT INTO products_compact (id, name, expiry_day) VALUES (new.id, new.name, ''' + DATE_TO_DAY.format(date="new.expiry_date") + ''');
+       END''',
+    '''CREATE TRIGGER products_update INSTEAD OF UPDATE ON products BEGIN
+       UPDATE products_compact SET id = new.id, name = new.name, expiry_day = ''' + DATE_TO_DAY.format(date="new.expiry_date") + '''
+       WHERE id = old.id;
+       END''',
+    '''CREATE TRIGGER products_delete INSTEAD OF DELETE ON products BEGIN
+       DELETE FROM products_compact WHERE id = old.id;
+       END''',
+] + [trigger.replace(" ON products BEGIN", " ON products_compact BEGIN") for trigger in SCHEMA_MIGRATIONS[3][1:4]] # full text index triggers
+ATTACH_LIMIT = 10 # SQLite's default limit on the databases attached to one connection
+# Global variables
+migrated_databases = set() # databases which have been brought up to date since IMPP started
+
+class SettingsStore:
+    # Parsed copy of the settings file which is only read again when the file changes on disk (e.g. edited by hand)
+    def __init__(self, path):
+        self.path = path
+        self.config = configparser.ConfigParser()
+        self.stamp = None # (modified time, size) of the file when it was last read or written
+        self.lock = threading.RLock()
+
+    def file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def current(self):
+        # Returns the parsed settings, re-reading the file first if it has changed since it was last seen
+        with self.lock:
+            stamp = self.file_stamp()
+            if stamp != self.stamp:
+                config = configparser.ConfigParser()
+                config.read(self.path)
+                self.config, self.stamp = config, stamp
+            return self.config
+
+    def get(self, section, key):
+        with self.lock:
+            setting = self.current().get(section, key, fallback=DEFAULT_SETTINGS.get(section, {}).get(key))
+        if setting is None:
+            raise KeyError(key)
+        return setting
+
+    def section(self, section):
+        with self.lock:
+            config = self.current()
+            return dict(config[section]) if config.has_section(section) else {}
+
+    def set(self, section, key, value):
+        with self.lock:
+            config = self.current()
+            if not config.has_section(section):
+                config.add_section(section)
+            config.set(section, key, value)
+            self.save()
+
+    def remove(self, section, key):
+        with self.lock:
+            removed = self.current().remove_option(section, key)
+            self.save()
+        return removed
+
+    def save(self):
+        # Write the cached settings out and remember the file's new stamp so they aren't read straight back in
+        with open(self.path, "w+") as configfile:
+            self.config.write(configfile)
+        self.stamp = self.file_stamp()
+
+    @property
+    def scan_interval(self):
+        return int(self.get("Notifications", "scan_interval"))
+
+    @property
+    def notify_days(self):
+        return int(self.get("Notifications", "notify_days"))
+
+    @property
+    def summary_items(self):
+        return int(self.get("Notifications", "summary_items"))
+
+    @property
+    def max_notifications(self):
+        return int(self.get("Notifications", "max_notifications"))
+
+    @property
+    def notify_gap(self):
+        return float(self.get("Notifications", "notify_gap"))
+
+    @property
+    def notify_queue(self):
+        return int(self.get("Notifications", "notify_queue"))
+
+    @property
+    def remind_after(self):
+        return int(self.get("Notifications", "remind_after"))
+
+    @property
+    def scan_workers(self):
+        return int(self.get("Scanning", "scan_workers"))
+
+    @property
+    def scan_method(self):
+        return self.get("Scanning", "scan_method")
+
+    @property
+    def metrics_textfile(self):
+        return self.get("Metrics", "textfile")
+
+    @property
+    def profiling(self):
+        return self.get("Profiling", "enabled").strip().lower() in ("yes", "true", "on", "1")
+
+    @property
+    def profiles_kept(self):
+        return int(self.get("Profiling", "keep"))
+
+    @property
+    def databases(self):
+        return self.section("Databases")
+
+settings_store = SettingsStore(SETTINGS)
+
+def database_uri(db_path, mode):
+    # SQLite URI opening db_path in mode ("ro" read only, "rw" read and write but never create). Path.as_uri() turns a
+    # UNC path (\\server\share\lab.db) into file://server/share/lab.db, which SQLite rejects as it only accepts an empty
+    # or "localhost" authority, so the path goes after an empty one instead: file:////server/share/lab.db,
+    # file:///C:/lab.db or file:///home/lab.db
+    path = os.path.abspath(db_path).replace("\\", "/")
+    if not path.startswith("/"): # drive letter
+        path = "/" + path
+    return "file://" + quote(path, safe="/:") + "?mode=" + mode
+
+class ConnectionPool:
+    # Keeps database connections open between scans and editor clicks, as opening a database on a network share is slow.
+    # A borrowed connection belongs to the borrowing thread until it is released, so connections can safely move
+    # between the scanning threads, the editor and the tray without two threads ever using one at the same time.
+    def __init__(self, idle_timeout=30*60):
+        self.idle_timeout = idle_timeout # seconds an unused connection is kept open for
+        self.idle = {} # database path: list of (connection, time it was returned)
+        self.lock = threading.Lock()
+
+    def acquire(self, db_path):
+        self.evict_idle()
+        while True:
+            with self.lock:
+                if not self.idle.get(db_path):
+                    break
+                conn, _ = self.idle[db_path].pop()
+            if self.healthy(db_path, conn):
+                return conn
+            conn.close() # stale connection (file moved, share dropped) so throw it away and try the next one
+        # rw rather than the default rwc, so a database which has been moved or deleted is an error instead of a new empty file
+        conn = sqlite3.connect(database_uri(db_path, "rw"), uri=True, check_same_thread=False)
+        upgrade_database(db_path, conn)
+        return conn
+
+    def release(self, db_path, conn):
+        if conn.in_transaction: # never hand on half finished work
+            conn.rollback()
+        with self.lock:
+            self.idle.setdefault(db_path, []).append((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self, db_path):
+        conn = self.acquire(db_path)
+        try:
+            yield conn
+        finally:
+            self.release(db_path, conn)
+
+    def healthy(self, db_path, conn):
+        if not os.path.exists(db_path):
+            return False
+        try:
+            conn.execute("PRAGMA schema_version").fetchone() # reads the database header so a dropped share is noticed
+            return True
+        except sqlite3.Error:
+            return False
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self.lock:
+            for db_path, connections in self.idle.items():
+                expired += [conn for conn, returned in connections if returned < cutoff]
+                connections[:] = [(conn, returned) for conn, returned in connections if returned >= cutoff]
+        for conn in expired:
+            conn.close()
+
+    def close_all(self):
+        with self.lock:
+            connections = [conn for stack in self.idle.values() for conn, _ in stack]
+            self.idle.clear()
+        for conn in connections:
+            conn.close()
+
+connection_pool = ConnectionPool()
+
+class ScanCache:
+    # Remembers the last scan of each database along with a change token, so unchanged databases aren't queried again
+    def __init__(self):
+        self.entries = {} # database path: (change token, scanned products)
+        self.soonest = {} # database path: (change token of the scan it was read after, k, soonest products)
+        self.lock = threading.Lock()
+
+    def lookup(self, db_path, token):
+        with self.lock:
+            entry = self.entries.get(db_path)
+        if entry and entry[0] == token:
+            return entry[1]
+        return None
+
+    def store(self, db_path, token, products):
+        with self.lock:
+            self.entries[db_path] = (token, products)
+
+    def token(self, db_path):
+        # Change token of the database's last scan, or None if it hasn't been scanned (or was edited since)
+        with self.lock:
+            entry = self.entries.get(db_path)
+        return entry[0] if entry else None
+
+    def lookup_soonest(self, db_path, token, k):
+        with self.lock:
+            entry = self.soonest.get(db_path)
+        if entry and entry[0] == token and entry[1] == k:
+            return entry[2]
+        return None
+
+    def store_soonest(self, db_path, token, k, products):
+        with self.lock:
+            self.soonest[db_path] = (token, k, products)
+
+    def invalidate(self, db_path=None):
+        # Forget one database's cached scan (e.g. after IMPP edits it) or every cached scan
+        with self.lock:
+            if db_path is None:
+                self.entries.clear()
+                self.soonest.clear()
+            else:
+                self.entries.pop(db_path, None)
+                self.soonest.pop(db_path, None)
+
+scan_cache = ScanCache()
+
+class ScanMetrics:
+    # Timings and counts from scanning, written out in the Prometheus text format for node exporter's textfile collector.
+    # Per database timings are split into phases: "connect" (borrowing a pooled connection, opening the file if need be),
+    # "query" (the scan queries, or the scan cache check) and "notify" (showing its notifications). Databases read
+    # together with the attach scan method only get row and error counts, one statement reads the whole batch.
+    PREFIX = "impp_scan"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {} # (database, phase): seconds the phase took in the last scan
+        self.seconds_total = {} # (database, phase): seconds the phase has taken in every scan
+        self.rows = {} # database: products found by the last scan
+        self.scans = {} # database: scans
+        self.errors = {} # database: scans which failed
+        self.cache_hits = {} # database: scans answered from the scan cache
+        self.unreadable = {} # database: products found by the last scan with an expiry date it couldn't read
+        self.notifications_dropped = 0 # notifications dropped because too many were waiting to be shown
+        self.cycles = 0
+        self.cycle_seconds = 0.0 # last scan cycle, scanning and notifying every database
+        self.cycle_seconds_total = 0.0
+        self.last_cycle = None # unix time the last cycle finished
+
+    def observe(self, database, phase, seconds):
+        with self.lock:
+            self.seconds[database, phase] = seconds
+            self.seconds_total[database, phase] = self.seconds_total.get((database, phase), 0.0) + seconds
+
+    def cache_hit(self, database):
+        with self.lock:
+            self.cache_hits[database] = self.cache_hits.get(database, 0) + 1
+
+    def scanned(self, database, rows, error=None):
+        with self.lock:
+            self.rows[database] = rows
+            self.scans[database] = self.scans.get(database, 0) + 1
+            self.errors[database] = self.errors.get(database, 0) + (1 if error else 0)
+
+    def unreadable_dates(self, database, count):
+        with self.lock:
+            self.unreadable[database] = count
+
+    def notification_dropped(self):
+        with self.lock:
+            self.notifications_dropped += 1
+
+    def cycle(self, seconds):
+        with self.lock:
+            self.cycles += 1
+            self.cycle_seconds = seconds
+            self.cycle_seconds_total += seconds
+            self.last_cycle = time.time()
+
+    def render(self):
+        # Prometheus text exposition format
+        def label(value): # escape a label value
+            return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        lines = []
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP {self.PREFIX}_{name} {help}")
+            lines.append(f"# TYPE {self.PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                labels = ",".join(f'{key}="{label(text)}"' for key, text in labels)
+                lines.append(f"{self.PREFIX}_{name}{{{labels}}} {value}" if labels else f"{self.PREFIX}_{name} {value}")
+        with self.lock:
+            metric("database_seconds", "gauge", "Seconds each phase of the last scan of a database took.",
+                   [((("database", database), ("phase", phase)), seconds) for (database, phase), seconds in sorted(self.seconds.items())])
+            metric("database_seconds_total", "counter", "Seconds spent in each phase scanning a database since IMPP started.",
+                   [((("database", database), ("phase", phase)), seconds) for (database, phase), seconds in sorted(self.seconds_total.items())])
+            metric("rows", "gauge", "Expired and upcoming products found by the last scan of a database.",
+                   [((("database", database),), rows) for database, rows in sorted(self.rows.items())])
+            metric("scans_total", "counter", "Scans of a database.", [((("database", database),), count) for database, count in sorted(self.scans.items())])
+            metric("errors_total", "counter", "Scans of a database which failed.", [((("database", database),), count) for database, count in sorted(self.errors.items())])
+            metric("cache_hits_total", "counter", "Scans of a database answered from the scan cache.",
+                   [((("database", database),), count) for database, count in sorted(self.cache_hits.items())])
+            metric("unreadable_dates", "gauge", "Products found by the last scan of a database whose expiry date isn't YYYY-MM-DD.",
+                   [((("database", database),), count) for database, count in sorted(self.unreadable.items())])
+            metric("notifications_dropped_total", "counter", "Notifications dropped because too many were waiting to be shown.",
+                   [((), self.notifications_dropped)])
+            metric("cycles_total", "counter", "Scan cycles run.", [((), self.cycles)])
+            metric("cycle_seconds", "gauge", "Seconds the last scan cycle took.", [((), self.cycle_seconds)])
+            metric("cycle_seconds_total", "counter", "Seconds spent in scan cycles.", [((), self.cycle_seconds_total)])
+            if self.last_cycle is not None:
+                metric("last_cycle_timestamp_seconds", "gauge", "Unix time the last scan cycle finished.", [((), self.last_cycle)])
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        # Written to a temporary file first and renamed into place, so the collector never reads a half written file
+        temporary = path + ".tmp" # not *.prom, so it is ignored by the collector
+        with open(temporary, "w", encoding="utf-8", newline="\n") as textfile:
+            textfile.write(self.render())
+        os.replace(temporary, path)
+
+scan_metrics = ScanMetrics()
+
+class DatabaseScanner:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = connection_pool.acquire(db_path)
+        self.cursor = self.conn.cursor()
+        self.compact = compact_storage(self.conn)
+
+    def day_params(self, notify_days):
+        # today and the end of the notify window, as dates for text storage and as day numbers for compact storage
+        today = datetime.now().date()
+        later = today + timedelta(days=notify_days)
+        return {"today": today.strftime("%Y-%m-%d"), "later": later.strftime("%Y-%m-%d"), "notify_days": notify_days,
+                "today_day": (today - EPOCH).days, "later_day": (later - EPOCH).days}
+
+    def scan(self, notify_days):
+        # returns (id, name, expiry_date, days_left, status) for every expired product and every product expiring in the next notify_days
+        self.cursor.execute(COMPACT_SCAN_QUERY if self.compact else SCAN_QUERY, self.day_params(notify_days))
+        return self.cursor.fetchall()
+
+    def next_change(self, notify_days):
+        # returns the next date ("YYYY-MM-DD") a product becomes upcoming or expired, or None if nothing will
+        self.cursor.execute(COMPACT_NEXT_CHANGE_QUERY if self.compact else NEXT_CHANGE_QUERY, self.day_params(notify_days))
+        return self.cursor.fetchone()[0]
+
+    def change_token(self, notify_days):
+        # Anything that changes the scan result changes the token: the database (and write ahead log) file being written,
+        # another connection committing (data_version, only comparable on the same connection), the date or the notify window
+        stamps = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        data_version = self.cursor.execute("PRAGMA data_version").fetchone()[0]
+        return (tuple(stamps), self.conn, data_version, datetime.now().date(), notify_days)
+
+    def close(self):
+        self.cursor.close()
+        connection_pool.release(self.db_path, self.conn)
+
+class ProductPager:
+    # Reads a database's products one page at a time using keyset pagination - each page starts after (or before) the
+    # sort key of a row already on screen, so reading any page costs the same however far into the table it is
+    ORDERS = {"expiry": "expiry_date", "name": "name"} # sort orders, both backed by an index
+
+    def __init__(self, db_path, order="expiry", page_size=100):
+        self.db_path = db_path
+        self.column = self.ORDERS[order]
+        self.page_size = page_size
+
+    def read(self, operator=None, row=None, descending=False):
+        # The page of products after (operator ">") or before ("<") row, or the first page
+        direction = "DESC" if descending else "ASC"
+        with connection_pool.connection(self.db_path) as conn:
+            table, expiry_date, column, value = "products", "expiry_date", self.column, "?"
+            if self.column == "expiry_date" and compact_storage(conn): # sort on the indexed day numbers, the view's dates aren't
+                table, expiry_date, column, value = "products_compact", DAY_TO_DATE.format(day="expiry_day"), "expiry_day", DATE_TO_DAY.format(date="?")
+            where = f"WHERE ({column}, id) {operator} ({value}, ?)" if row else ""
+            query = (f"SELECT id, name, {expiry_date} FROM {table} {where} "
+                     f"ORDER BY {column} {direction}, id {direction} LIMIT ?")
+            rows = conn.execute(query, (*(self.sort_key(row) if row else ()), self.page_size)).fetchall()
+        return rows[::-1] if descending else rows
+
+    def sort_key(self, row):
+        id, name, expiry_date = row
+        return (expiry_date if self.column == "expiry_date" else name, id)
+
+    def first_page(self):
+        return self.read()
+
+    def page_after(self, row):
+        # the page of products that follows row
+        return self.read(">", row)
+
+    def page_before(self, row):
+        # the page of products that comes before row
+        return self.read("<", row, descending=True)
+
+def compact_storage(conn):
+    # Whether a database keeps its expiry dates as day numbers (see compact_database)
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_compact'").fetchone() is not None
+
+def insert_statement(conn):
+    # INSERT for (name, expiry_date) rows, straight into products_compact on compact databases. Going through the view's
+    # trigger would also work, but then lastrowid isn't the new product's id
+    if compact_storage(conn):
+        return "INSERT INTO products_compact (name, expiry_day) VALUES (?, " + DATE_TO_DAY.format(date="?") + ")"
+    return "INSERT INTO products (name, expiry_date) VALUES (?, ?)"
+
+def insert_product(conn, name, expiry_date):
+    # Add one product and return its id
+    return conn.execute(insert_statement(conn), (name, expiry_date)).lastrowid
+
+def compact_database(db_path):
+    # Convert a database to compact storage, returns the number of products converted
+    with connection_pool.connection(db_path) as conn: # brings the schema up to date first
+        if compact_storage(conn):
+            raise ValueError("Database already uses compact storage.")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < len(SCHEMA_MIGRATIONS):
+            raise ValueError("Database couldn't be upgraded to the latest schema, is it read only or in use?")
+        unreadable = conn.execute("SELECT COUNT(*) FROM products WHERE julianday(expiry_date) IS NULL").fetchone()[0]
+        if unreadable:
+            raise ValueError(f"{unreadable} products have expiry dates which aren't YYYY-MM-DD, fix them in the editor first.")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in COMPACT_STORAGE:
+                conn.execute(statement)
+            products = conn.execute("SELECT COUNT(*) FROM products_compact").fetchone()[0]
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        conn.execute("VACUUM") # hand back the space the text dates took up
+    scan_cache.invalidate(db_path)
+    return products
+
+def create_database(db_path):
+    # Create a products database (or bring an existing one up to date) at db_path
+    conn = sqlite3.connect(db_path)
+    try:
+        migrate_database(conn)
+    finally:
+        conn.close()
+
+def migrate_database(conn):
+    # Apply any schema migrations the database hasn't had yet and return its schema version
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    while version < len(SCHEMA_MIGRATIONS):
+        try:
+            conn.execute("BEGIN IMMEDIATE") # take the write lock so two IMPPs can't migrate the same file at once
+            version = conn.execute("PRAGMA user_version").fetchone()[0] # another process may have got there first
+            if version < len(SCHEMA_MIGRATIONS):
+                migration = SCHEMA_MIGRATIONS[version]
+                for statement in (migration if isinstance(migration, tuple) else (migration,)): # some migrations take several statements
+                    conn.execute(statement)
+                version += 1
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.OperationalError: # read only or locked database, carry on with the old schema and try again next time
+            if conn.in_transaction:
+                conn.rollback()
+            break
+    return version
+
+def upgrade_database(db_path, conn):
+    # Migrate a database the first time it is opened since IMPP started. Only files which already have a products
+    # table are upgraded, anything else (e.g. some other program's SQLite file) is left untouched - new databases are
+    # made by create_database
+    if db_path in migrated_databases:
+        return
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products'").fetchone():
+        return
+    if migrate_database(conn) >= len(SCHEMA_MIGRATIONS):
+        migrated_databases.add(db_path)
+
+def like_pattern(text):
+    # LIKE pattern matching names containing text, for databases without a full text index
+    return "%" + text.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def search_terms(text):
+    # Turn what was typed into an FTS5 query - every word has to match, each as a prefix so results show up mid word
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+def search_products(db_path, text, limit=200):
+    # Products whose names match text, best matches first
+    terms = search_terms(text)
+    if not terms:
+        return []
+    with connection_pool.connection(db_path) as conn:
+        try:
+            return conn.execute(SEARCH_QUERY, (terms, limit)).fetchall()
+        except sqlite3.OperationalError: # SQLite built without FTS5, or the database couldn't be migrated yet
+            return conn.execute("SELECT id, name, expiry_date FROM products WHERE name LIKE ? ESCAPE '\\' ORDER BY name, id LIMIT ?",
+                                (like_pattern(text), limit)).fetchall()
+
+def scan_database(db_path, notify_days, name=None):
+    # Scan a single database and return its classified products and the next date one changes state,
+    # reusing the last scan if nothing has changed since. Timings are recorded in scan_metrics under name
+    name = name or str(db_path)
+    start = time.perf_counter()
+    scanner = DatabaseScanner(str(db_path))  # Ensure db_path is a string
+    connected = time.perf_counter()
+    scan_metrics.observe(name, "connect", connected - start)
+    try:
+        token = scanner.change_token(notify_days)
+        result = scan_cache.lookup(scanner.db_path, token)
+        if result is None:
+            result = (scanner.scan(notify_days), scanner.next_change(notify_days))
+            scan_cache.store(scanner.db_path, token, result)
+        else:
+            scan_metrics.cache_hit(name)
+        scan_metrics.observe(name, "query", time.perf_counter() - connected)
+        return result
+    finally:
+        # Return the database connection to the pool
+        scanner.close()
+
+def scan_databases(database_settings, notify_days, workers, method="parallel"):
+    # Scan every database, yielding (name, products, next change, error) in settings order
+    if method == "attach":
+        results = scan_attached_databases(database_settings, notify_days)
+    else:
+        results = scan_in_parallel(database_settings, notify_days, workers)
+    for name, products, next_change, error in results:
+        scan_metrics.scanned(name, len(products), error)
+        yield name, products, next_change, error
+
+def scan_in_parallel(database_settings, notify_days, workers):
+    # Scan databases on a pool of worker threads so one slow database doesn't hold up the rest.
+    # Yields each database's result as soon as that database and every one before it has finished
+    names = list(database_settings)
+    if profiling_this_thread(): # cProfile only sees the thread it runs on, so scan one database at a time here for the profile to show the queries
+        for name in names:
+            try:
+                products, next_change = scan_database(database_settings[name], notify_days, name)
+                yield name, products, next_change, None
+            except sqlite3.Error as error:
+                yield name, [], None, error
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names) or 1))) as executor:
+        futures = [executor.submit(scan_database, database_settings[name], notify_days, name) for name in names]
+        for name, future in zip(names, futures):
+            try:
+                products, next_change = future.result()
+                yield name, products, next_change, None
+            except sqlite3.Error as error: # unreadable database, skip it rather than stopping the whole scan
+                yield name, [], None, error
+
+class AttachedDatabases:
+    # Query engine over every database at once. Databases are attached read only to one connection, ATTACH_LIMIT at a
+    # time, and a query written for one database is repeated for each of them with UNION ALL, so a whole batch is read
+    # with a single statement. Queries use {schema} for the attached database and {database} for its name in settings.
+    def __init__(self, database_settings):
+        self.databases = list(database_settings.items())
+        self.errors = {} # name: error for databases that couldn't be attached
+
+    def batches(self):
+        # Yields (connection, [(number, name), ...] of the databases attached to it) for each batch
+        for start in range(0, len(self.databases), ATTACH_LIMIT):
+            conn = sqlite3.connect(":memory:", uri=True, check_same_thread=False) # uri so databases can be attached read only
+            try:
+                attached = []
+                for number, (name, db_path) in enumerate(self.databases[start:start + ATTACH_LIMIT]):
+                    try:
+                        conn.execute(f"ATTACH DATABASE ? AS db{number}", (database_uri(db_path, "ro"),))
+                        conn.execute(f"SELECT 1 FROM db{number}.products LIMIT 0") # fails here if the file isn't a products database
+                        attached.append((number, name))
+                    except sqlite3.Error as error:
+                        self.errors[name] = error
+                if attached:
+                    yield conn, attached
+            finally:
+                conn.close()
+
+    def execute(self, conn, attached, query, params, suffix="", **parts):
+        # Run query once for each attached database joined with UNION ALL, then suffix (e.g. ORDER BY) over all of them.
+        # parts fill in any other {placeholders}, and may use {schema} and {database} themselves
+        branches = []
+        for number, name in attached:
+            names = {"schema": f"db{number}.", "database": f":database{number}"}
+            branches.append(query.format(**names, **{key: part.format(**names) for key, part in parts.items()}))
+        params = dict(params, **{f"database{number}": name for number, name in attached})
+        return conn.execute(" UNION ALL ".join(branches) + suffix.format(**parts), params)
+
+    def query(self, query, params, suffix="", **parts):
+        # Yields the rows from each batch of databases in turn
+        for conn, attached in self.batches():
+            yield self.execute(conn, attached, query, params, suffix, **parts).fetchall()
+
+def scan_attached_databases(database_settings, notify_days):
+    # Same results as the parallel scan, but every database in a batch is scanned by one statement on one connection
+    today = datetime.now().date()
+    later = today + timedelta(days=notify_days)
+    params = {"today": today.strftime("%Y-%m-%d"), "later": later.strftime("%Y-%m-%d"), "notify_days": notify_days}
+    engine = AttachedDatabases(database_settings)
+    products = {name: [] for name in database_settings}
+    next_changes = {}
+    for conn, attached in engine.batches():
+        try:
+            for database, *product in engine.execute(conn, attached, ATTACHED_SCAN_QUERY, params, " ORDER BY database, expiry_date"):
+                products[database].append(tuple(product))
+            next_changes.update(engine.execute(conn, attached, ATTACHED_NEXT_CHANGE_QUERY, params).fetchall())
+        except sqlite3.Error as error: # one unreadable database fails its whole batch
+            for number, name in attached:
+                engine.errors[name] = error
+                products[name] = []
+    for name in database_settings:
+        yield name, products[name], next_changes.get(name), engine.errors.get(name)
+
+class AttachedPager(ProductPager):
+    # ProductPager over every database at once. Rows are (id, name, expiry_date, database), ordered by the page order
+    # then database name then id, each page merged from the pages read from every batch of attached databases
+    def __init__(self, database_settings, order="expiry", page_size=100):
+        super().__init__(None, order, page_size)
+        self.engine = AttachedDatabases(database_settings)
+
+    def read(self, where, params, descending=False):
+        direction = "DESC" if descending else "ASC"
+        batches = self.engine.query(ATTACHED_PAGE_QUERY, dict(params, limit=self.page_size),
+                                    " ORDER BY {column} {direction}, database {direction}, id {direction} LIMIT :limit",
+                                    where=where, column=self.column, direction=direction)
+        rows = list(islice(heapq.merge(*batches, key=self.sort_key, reverse=descending), self.page_size))
+        return rows[::-1] if descending else rows
+
+    def sort_key(self, row):
+        id, name, expiry_date, database = row
+        return (expiry_date if self.column == "expiry_date" else name, database, id)
+
+    def keyset(self, row, operator):
+        # Rows in each database that come after (">") or before ("<") row. Databases named before row's compare the
+        # sort column alone past its value, row's own database compares (column, id), later databases include the value
+        value, database, id = self.sort_key(row)
+        where = (f"WHERE ({self.column}, id) {operator} (:value, CASE WHEN {{database}} < :anchor THEN 9223372036854775807 "
+                 f"WHEN {{database}} = :anchor THEN :id ELSE 0 END)")
+        return where, {"value": value, "anchor": database, "id": id}
+
+    def first_page(self):
+        return self.read("", {})
+
+    def page_after(self, row):
+        return self.read(*self.keyset(row, ">"))
+
+    def page_before(self, row):
+        return self.read(*self.keyset(row, "<"), descending=True)
+
+def search_attached_databases(database_settings, text, limit=200):
+    # search_products across every database, rows are (id, name, expiry_date, database)
+    terms = search_terms(text)
+    if not terms:
+        return []
+    engine = AttachedDatabases(database_settings)
+    try:
+        batches = list(engine.query(ATTACHED_SEARCH_QUERY, {"terms": terms, "limit": limit}, " ORDER BY rank LIMIT :limit"))
+        return [row[:4] for row in islice(heapq.merge(*batches, key=lambda row: row[4]), limit)]
+    except sqlite3.OperationalError: # a database without a full text index
+        batches = list(engine.query(ATTACHED_LIKE_QUERY, {"pattern": like_pattern(text), "limit": limit}, " ORDER BY name, database, id LIMIT :limit"))
+        return list(islice(heapq.merge(*batches, key=lambda row: (row[1], row[3], row[0])), limit))
+
+def soonest_in_database(db_path, k):
+    # The k soonest products still to expire in one database. They only change when the database (or the date) does,
+    # so they are kept against the change token of the database's last scan and read again only once a scan has
+    # found the database changed - scanning and then calling this costs nothing extra for unchanged databases
+    token = scan_cache.token(db_path)
+    if token is not None:
+        products = scan_cache.lookup_soonest(db_path, token, k)
+        if products is not None:
+            return products
+    today = datetime.now().date()
+    with connection_pool.connection(db_path) as conn:
+        query = COMPACT_SOONEST_QUERY if compact_storage(conn) else SOONEST_QUERY
+        products = conn.execute(query, {"today": today.strftime("%Y-%m-%d"), "today_day": (today - EPOCH).days, "limit": k}).fetchall()
+    if token is not None:
+        scan_cache.store_soonest(db_path, token, k, products)
+    return products
+
+def merge_soonest(product_lists, k):
+    # k-way merge of lists of (database, id, name, expiry_date, ...) rows which are each already in expiry order,
+    # stopping once the k soonest have been taken
+    return list(islice(heapq.merge(*product_lists, key=lambda product: product[3]), k))
+
+def soonest_expiring(database_settings, k, workers=4):
+    # The k products due to expire soonest across every database, as (database, id, name, expiry_date). Each database
+    # only returns its own k soonest, so this reads databases x k rows however many products there are
+    names = list(database_settings)
+    product_lists = []
+    if profiling_this_thread(): # as in scan_in_parallel
+        for name in names:
+            try:
+                product_lists.append([(name, *product) for product in soonest_in_database(database_settings[name], k)])
+            except sqlite3.Error:
+                continue
+        return merge_soonest(product_lists, k)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names) or 1))) as executor:
+        futures = [executor.submit(soonest_in_database, database_settings[name], k) for name in names]
+        for name, future in zip(names, futures):
+            try:
+                product_lists.append([(name, *product) for product in future.result()])
+            except sqlite3.Error: # unreadable database, the scan reports it
+                continue
+    return merge_soonest(product_lists, k)
+
+class ScanResult:
+    # Columnar scan results for every database: parallel arrays with one entry per product instead of a tuple per row.
+    # Expiry dates are day numbers (see EPOCH) and each product name is stored once in name_table, however many
+    # bottles share it. Each database's rows are in expiry order, so expired products come first and counting
+    # them, or any days-left bucket, is a binary search rather than a pass over the rows.
+    STATUSES = ("expired", "upcoming")
+
+    def __init__(self, today=None):
+        self.today = ((today or datetime.now().date()) - EPOCH).days
+        self.databases = [] # database names in scan order
+        self.errors = [] # error (or None) for each database
+        self.next_changes = [] # next date ("YYYY-MM-DD", or None) a product in each database changes state
+        self.unreadable = [] # products in each database whose expiry date isn't a YYYY-MM-DD date
+        self.unreadable_rows = {} # row: the product's scanned (id, name, expiry_date, None, status), for those products
+        self.offsets = array("q", [0]) # rows offsets[n]:offsets[n + 1] belong to database n
+        self.ids = array("q")
+        self.days = array("i") # expiry dates as day numbers
+        self.names = array("i") # position of each product's name in name_table
+        self.name_numbers = {} # name: position in name_table
+        self.name_table = []
+
+    @classmethod
+    def collect(cls, scan_results, today=None):
+        # Build a ScanResult from scan_databases' (name, products, next change, error) results
+        result = cls(today)
+        for name, products, next_change, error in scan_results:
+            result.add(name, products, next_change, error)
+            scan_metrics.unreadable_dates(name, result.unreadable[-1])
+        return result
+
+    def add(self, database, products, next_change=None, error=None):
+        # Append one database's (id, name, expiry_date, days_left, status) rows, in expiry order
+        self.databases.append(database)
+        self.errors.append(error)
+        self.next_changes.append(next_change)
+        # SQLite can't work out days left for a date typed in another format (e.g. 2024/12/31), but the scan query still
+        # labels it expired or upcoming by comparing the text. Those products are kept with that status, put first among
+        # the products of the same status so the day numbers stay in order (the earliest day possible if expired, today
+        # if upcoming), and the rows as scanned are kept in unreadable_rows
+        unreadable = [product for product in products if product[3] is None]
+        self.unreadable.append(len(unreadable))
+        if unreadable:
+            readable = [product for product in products if product[3] is not None]
+            products = ([product for product in unreadable if product[4] == "expired"] + [product for product in readable if product[3] < 0] +
+                        [product for product in unreadable if product[4] != "expired"] + [product for product in readable if product[3] >= 0])
+            for row, product in enumerate(products, len(self.ids)):
+                if product[3] is None:
+                    self.unreadable_rows[row] = product
+        if products:
+            ids, names, expiry_dates, days_left, statuses = zip(*products) # rows to columns
+            self.ids.extend(ids)
+            if unreadable:
+                days_left = [(UNREADABLE_DAY - self.today if status == "expired" else 0) if days is None else days
+                             for days, status in zip(days_left, statuses)]
+            self.days.extend(map(self.today.__add__, days_left)) # days left is already worked out by the scan query
+            numbers = self.name_numbers
+            for name in names:
+                if name not in numbers:
+                    numbers[name] = len(self.name_table)
+                    self.name_table.append(name)
+            self.names.extend(map(numbers.__getitem__, names))
+        self.offsets.append(len(self.ids))
+
+    def rows(self, number, status=None):
+        # (start, end) of database number's rows, or of just its rows of one status
+        start, end = self.offsets[number], self.offsets[number + 1]
+        split = bisect_left(self.days, self.today, start, end) # first product which hasn't expired
+        if status == "expired":
+            return start, split
+        if status == "upcoming":
+            return split, end
+        return start, end
+
+    def count(self, number, status=None):
+        start, end = self.rows(number, status)
+        return end - start
+
+    def total(self, status=None):
+        return sum(self.count(number, status) for number in range(len(self.databases)))
+
+    def counts(self):
+        # {database: {"expired": count, "upcoming": count}}
+        return {database: {status: self.count(number, status) for status in self.STATUSES}
+                for number, database in enumerate(self.databases)}
+
+    def buckets(self, bounds=(0, 7)):
+        # Products per database in days-left buckets split at bounds, e.g. (0, 7) counts expired, due within a week
+        # and the rest. Returns {database: [count in each bucket]}
+        buckets = {}
+        for number, database in enumerate(self.databases):
+            start, end = self.rows(number)
+            edges = [start] + [bisect_left(self.days, self.today + bound, start, end) for bound in bounds] + [end]
+            buckets[database] = [high - low for low, high in zip(edges, edges[1:])]
+        return buckets
+
+    def tray_state(self):
+        # (state, expired count, upcoming count) for the tray icon, state is "expired" if anything has expired,
+        # "warning" if anything is due to expire within the notify window, otherwise "ok"
+        expired, upcoming = self.total("expired"), self.total("upcoming")
+        return ("expired" if expired else "warning" if upcoming else "ok"), expired, upcoming
+
+    def days_left(self):
+        # Days until expiry for every product in one go, as a numpy array if numpy is installed
+        try:
+            import numpy # optional, the arrays can be viewed by numpy without copying
+        except ImportError:
+            return array("i", (day - self.today for day in self.days))
+        return numpy.frombuffer(self.days, dtype=numpy.int32) - self.today
+
+    def severities(self):
+        # Status of every product in one go, 0 for expired and 1 for upcoming (the index into STATUSES)
+        try:
+            import numpy
+        except ImportError:
+            return array("b", (day >= self.today for day in self.days))
+        return (numpy.frombuffer(self.days, dtype=numpy.int32) >= self.today).astype(numpy.int8)
+
+    def products(self, number, status=None, limit=None):
+        # The first limit products of database number (optionally of one status) as
+        # (id, name, expiry_date, days_left, status) rows, only these are turned back into dates and strings
+        start, end = self.rows(number, status)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self.product(row) for row in range(start, end)]
+
+    def product(self, row):
+        # One row as an (id, name, expiry_date, days_left, status) tuple
+        if row in self.unreadable_rows:
+            return self.unreadable_rows[row]
+        day = self.days[row]
+        return (self.ids[row], self.name_table[self.names[row]], date.fromordinal(EPOCH.toordinal() + day).strftime("%Y-%m-%d"),
+                day - self.today, "expired" if day < self.today else "upcoming")
+
+    def subset(self, rows):
+        # A new ScanResult with only some rows of each database, rows is {database number: [row, ...]} in expiry order
+        result = ScanResult()
+        result.today = self.today
+        for number, database in enumerate(self.databases):
+            result.add(database, [self.product(row) for row in rows.get(number, ())], self.next_changes[number], self.errors[number])
+        return result
+
+    def next_change(self):
+        # The next date any product in any database changes state
+        changes = [change for change in self.next_changes if change]
+        return min(changes) if changes else None
+
+    def nbytes(self):
+        # Memory taken by the columns (not counting the name strings themselves)
+        return sum(column.itemsize * len(column) for column in (self.offsets, self.ids, self.days, self.names))
+
+def summarise_products(db_name, status, count, listed):
+    # Build one (title, message, status) notification covering count products of one status in one database,
+    # naming only the listed ones (the soonest to expire, as (id, name, expiry_date, days_left, status) rows)
+    if count == 1:
+        id, product, expiry_date, days_left, status = listed[0]
+        if status == "expired":
+            return f"Expiry in \"{db_name}\"", f"\"{product}\" has now expired", status
+        if days_left is None:
+            return f"Upcoming Expiry in \"{db_name}\"", f"\"{product}\" is expiring on {expiry_date}.", status
+        return f"Upcoming Expiry in \"{db_name}\"", f"\"{product}\" is expiring in {days_left} days.", status
+
+    if status == "expired":
+        title = f"{count} items have expired in \"{db_name}\""
+        lines = [f"\"{product}\" expired {expiry_date}" for id, product, expiry_date, days_left, _ in listed]
+    else:
+        title = f"{count} items expiring soon in \"{db_name}\""
+        lines = [f"\"{product}\" on {expiry_date}" if days_left is None else f"\"{product}\" in {days_left} days"
+                 for id, product, expiry_date, days_left, _ in listed]
+    if count > len(listed):
+        lines.append(f"...and {count - len(listed)} more")
+    return title, "\n".join(lines), status
+
+def aggregate_notifications(scan_result, listed_items, max_notifications):
+    # Group a ScanResult into at most max_notifications summaries, one per database and status (expired first).
+    # Returns (title, message, status, database) - database is None for the notification that folds up the rest
+    groups = []
+    for number, db_name in enumerate(scan_result.databases):
+        for status in ScanResult.STATUSES:
+            count = scan_result.count(number, status)
+            if count:
+                groups.append((db_name, status, count, scan_result.products(number, status, listed_items)))
+    notifications = [(*summarise_products(db_name, status, count, listed), db_name) for db_name, status, count, listed in groups]
+
+    if len(notifications) > max_notifications > 0: # fold whatever doesn't fit into one final notification
+        hidden = groups[max_notifications - 1:]
+        status = "expired" if any(status == "expired" for db_name, status, count, listed in hidden) else "upcoming"
+        # name the soonest of the folded products, merged from each group's soonest (already in expiry order)
+        soonest = merge_soonest([[(db_name, *product) for product in listed] for db_name, status, count, listed in hidden], listed_items)
+        lines = [f"\"{product}\" in \"{db_name}\" {expiry_date}" for db_name, id, product, expiry_date, days_left, _ in soonest]
+        lines.append(f"{len(hidden)} more notifications, open the Database Editor to see them all.")
+        notifications = notifications[:max_notifications - 1]
+        notifications.append(("More items need attention", "\n".join(lines), status, None))
+    return notifications
+
+# Date formats accepted when importing products besides "YYYY-MM-DD", tried in order (day first, as written in our labs)
+IMPORT_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d", "%d/%m/%y")
+# Column headings recognised for product names and expiry dates, otherwise the first two columns are used
+IMPORT_NAME_HEADINGS = {"name", "product", "product name", "item", "description", "reagent"}
+IMPORT_EXPIRY_HEADINGS = {"expiry", "expiry date", "expiry_date", "expires", "exp", "use by", "best before"}
+
+class ImportReport:
+    # What happened during an import, for showing to the user
+    def __init__(self):
+        self.read = 0 # data rows read from the file
+        self.inserted = 0
+        self.duplicates = 0 # already in the database (or earlier in the file) with the same name and expiry date
+        self.invalid = 0 # missing a name or with an expiry date that couldn't be understood
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"Imported {self.inserted} of {self.read} rows ({self.duplicates} duplicates, {self.invalid} invalid) "
+                f"in {self.seconds:.1f} s, {self.rows_per_second:,.0f} rows/s")
+
+def normalise_date(value):
+    # Returns value as a "YYYY-MM-DD" string, or None if it isn't a date
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    text = str(value or "").strip().split(" ")[0] # drop any time of day
+    try:
+        return date.fromisoformat(text).isoformat() # fast path for dates already in "YYYY-MM-DD" form
+    except ValueError:
+        pass
+    for date_format in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+def read_spreadsheet_rows(file_path):
+    # Yields each row of a CSV or Excel file as a tuple of cells, streaming rather than loading the whole file
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in (".csv", ".txt"):
+        with open(file_path, newline="", encoding="utf-8-sig") as csv_file:
+            yield from (tuple(row) for row in csv.reader(csv_file))
+    elif extension in (".xlsx", ".xlsm"):
+        try:
+            import openpyxl # optional, only needed for Excel manifests
+        except ImportError:
+            raise ValueError("Importing Excel files needs openpyxl (pip install openpyxl), or save the manifest as CSV.") from None
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Can't import \"{extension}\" files, use a CSV or Excel (.xlsx) file.")
+
+def read_products(file_path, report):
+    # Yields (name, "YYYY-MM-DD") for each valid row of a manifest, counting rows read and invalid rows in report
+    rows = read_spreadsheet_rows(file_path)
+    name_column, expiry_column = 0, 1
+    first = next(rows, None)
+    if first is None:
+        return
+    headings = [str(cell or "").strip().lower() for cell in first]
+    if len(first) > 1 and normalise_date(first[1]) is None: # first row is a header, use it to find the columns
+        name_column = next((index for index, heading in enumerate(headings) if heading in IMPORT_NAME_HEADINGS), 0)
+        expiry_column = next((index for index, heading in enumerate(headings) if heading in IMPORT_EXPIRY_HEADINGS), 1)
+    else:
+        rows = chain([first], rows) # no header, the first row is a product
+
+    for row in rows:
+        if not any(row): # skip blank lines
+            continue
+        report.read += 1
+        name = str(row[name_column]).strip() if len(row) > name_column and row[name_column] is not None else ""
+        expiry_date = normalise_date(row[expiry_column]) if len(row) > expiry_column else None
+        if not name or not expiry_date:
+            report.invalid += 1
+            continue
+        yield name, expiry_date
+
+def import_products(db_path, file_path, batch_size=5000):
+    # Bulk import products from a CSV or Excel manifest, streamed batch_size rows at a time. Rows already in the database
+    # (same name and expiry date) are skipped, and each batch is inserted with executemany in a single transaction
+    report = ImportReport()
+    start = time.perf_counter()
+    with connection_pool.connection(db_path) as conn:
+        existing = set(conn.execute("SELECT name, expiry_date FROM products")) # hash of what's there already
+        insert = insert_statement(conn)
+        products = read_products(file_path, report)
+        while True:
+            chunk = list(islice(products, batch_size))
+            if not chunk:
+                break
+            batch = []
+            for product in chunk:
+                if product in existing:
+                    report.duplicates += 1
+                else:
+                    existing.add(product)
+                    batch.append(product)
+            if batch:
+                with conn: # one transaction per batch, committed (or rolled back on error) at the end
+                    conn.executemany(insert, batch)
+                report.inserted += len(batch)
+    scan_cache.invalidate(db_path)
+    report.seconds = time.perf_counter() - start
+    return report
+
+# Columns written by each kind of export
+EXPORT_COLUMNS = {
+    "products": ("database", "id", "name", "expiry_date"),
+    "scan": ("database", "id", "name", "expiry_date", "days_left", "status"),
+}
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_BATCH = 1000 # products read from a database per statement while exporting
+EXPORT_PRODUCTS_QUERY = "SELECT id, name, expiry_date FROM products WHERE id > ? ORDER BY id LIMIT ?"
+
+def connect_read_only(db_path):
+    # Read only connection, it never writes to the database (or creates one if the file is missing). While a statement
+    # is being read it still holds a shared lock which stops anyone writing, so keep each statement short
+    return sqlite3.connect(database_uri(db_path, "ro"), uri=True, check_same_thread=False)
+
+def export_rows(database_settings, kind, notify_days=None, batch_size=EXPORT_BATCH):
+    # Yields every row of one kind of export ("products" or "scan") from each database in turn. Products are read
+    # batch_size at a time after the last id seen, each batch its own finished statement, so the database is only
+    # locked for one batch at a time rather than for the whole export and the editor and scans can write in between.
+    # Memory use stays the same however big the databases are
+    for name, db_path in database_settings.items():
+        conn = connect_read_only(db_path)
+        try:
+            if kind == "products":
+                last_id = -1
+                while True:
+                    rows = conn.execute(EXPORT_PRODUCTS_QUERY, (last_id, batch_size)).fetchall()
+                    for row in rows:
+                        yield (name, *row)
+                    if len(rows) < batch_size:
+                        break
+                    last_id = rows[-1][0]
+            else: # the scan result is no bigger than what every scan already reads in one go
+                today = datetime.now().date()
+                later = today + timedelta(days=notify_days)
+                rows = conn.execute(SCAN_QUERY, {"today": today.strftime("%Y-%m-%d"), "later": later.strftime("%Y-%m-%d")}).fetchall()
+                for row in rows:
+                    yield (name, *row)
+        finally:
+            conn.close()
+
+def write_export(rows, columns, file_format, output, batch_size=50000):
+    # Write rows from a generator to output (an open text file for csv/jsonl, a path for parquet), returns the row count
+    count = 0
+    if file_format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif file_format == "jsonl":
+        for row in rows:
+            output.write(json.dumps(dict(zip(columns, row))) + "\n")
+            count += 1
+    elif file_format == "parquet":
+        try:
+            import pyarrow # optional, only needed for columnar exports
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet exports need pyarrow (pip install pyarrow), or export as csv/jsonl.") from None
+        writer = None
+        try:
+            while True:
+                batch = list(islice(rows, batch_size)) # one row group at a time
+                if not batch:
+                    break
+                table = pyarrow.Table.from_pydict({column: list(values) for column, values in zip(columns, zip(*batch))})
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(output, table.schema)
+                writer.write_table(table)
+                count += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        raise ValueError(f"Unknown export format \"{file_format}\", use one of {', '.join(EXPORT_FORMATS)}.")
+    return count
+
+# Profiling is decided once, when IMPP starts, so functions can be left unwrapped (no overhead at all) when it is off
+profile_lock = threading.Lock() # only one profile at a time, the profiler can't time two threads at once
+profiled_thread = threading.local() # .profiler is set on the thread being profiled
+
+def profiling_enabled():
+    # Profiling is on if the IMPP_PROFILE environment variable or the settings say so. Read when asked rather than at
+    # import, so it follows whichever settings file is in use (e.g. the command line's --settings)
+    return os.environ.get("IMPP_PROFILE", "").strip().lower() not in ("", "0", "no", "false", "off") or settings_store.profiling
+
+def profiling_this_thread():
+    # True while start_profile's profiler is running on the calling thread
+    return getattr(profiled_thread, "profiler", None) is not None
+
+def start_profile():
+    # Start profiling the calling thread, returns the profiler or None if profiling is off or a profile is already running
+    if not profiling_enabled() or not profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiled_thread.profiler = profiler
+    profiler.enable()
+    return profiler
+
+def save_profile(profiler, name):
+    # Stop a profile from start_profile and save it as PROFILE_FOLDER/<name>-<time>.prof, with a .txt summary of the
+    # slowest functions next to it, then delete the oldest profiles beyond the number kept
+    try:
+        profiler.disable()
+    finally:
+        profiled_thread.profiler = None
+        profile_lock.release()
+    os.makedirs(PROFILE_FOLDER, exist_ok=True)
+    stem = os.path.join(PROFILE_FOLDER, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}")
+    profiler.dump_stats(stem + ".prof")
+    with open(stem + ".txt", "w") as summary:
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(25)
+
+    profiles = sorted((entry for entry in os.scandir(PROFILE_FOLDER) if entry.name.endswith(".prof")),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:max(0, len(profiles) - settings_store.profiles_kept)]:
+        for old in (entry.path, entry.path[:-len(".prof")] + ".txt"):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+def profiled(name):
+    # Decorator profiling every call of a function when profiling is on, returning the function untouched when it isn't
+    # (decided when the function is defined, so turning profiling on in the settings applies after restarting IMPP)
+    def decorate(function):
+        if not profiling_enabled():
+            return function
+
+        @functools.wraps(function)
+        def profiled_function(*args, **kwargs):
+            profiler = start_profile()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if profiler:
+                    save_profile(profiler, name)
+        return profiled_function
+    return decorate
+
+def profile_report(folder=PROFILE_FOLDER, name=None):
+    # Combine every saved profile (or just those for name) into one pstats.Stats, sorted slowest first by cumulative time
+    paths = sorted(entry.path for entry in os.scandir(folder)
+                   if entry.name.endswith(".prof") and (name is None or entry.name.startswith(name + "-")))
+    if not paths:
+        return None, 0
+    return pstats.Stats(*paths).sort_stats("cumulative"), len(paths)
+
+class ExpiryScheduler(threading.Thread):
+    # Scans on one long lived thread, sleeping until the next time a product changes state (it enters the notify window
+    # or expires) or the regular scan interval comes round, whichever is sooner
+    def __init__(self, scan):
+        super().__init__(daemon=True)
+        self.scan = scan # function which scans and returns the datetime of the next state change (or None)
+        self.wake_event = threading.Event()
+        self.rescan = False
+        self.stopped = False
+
+    def run(self):
+        while not self.stopped:
+            self.rescan = False
+            try:
+                next_change = self.scan()
+            except Exception: # one failed scan mustn't stop the scheduler, try again when the scan interval comes round
+                next_change = None
+            last_scan = time.monotonic()
+            while not self.stopped and not self.rescan:
+                wait = last_scan + settings_store.scan_interval - time.monotonic() # regular rescan, in case something was missed
+                if next_change:
+                    wait = min(wait, (next_change - datetime.now()).total_seconds())
+                if wait <= 0 or not self.wake_event.wait(wait):
+                    break # scan is due
+                self.wake_event.clear() # woken early, either rescan or work out the wait again (e.g. scan interval changed)
+
+    def wake(self, rescan=True):
+        # Scan now, or with rescan=False just recalculate when the next scan is due
+        self.rescan = self.rescan or rescan
+        self.wake_event.set()
+
+    def stop(self):
+        self.stopped = True
+        self.wake_event.set()
+
+class NotificationLedger:
+    # Remembers which products have been notified and in which state, in a small SQLite database, so a product is
+    # announced when it comes due or expires and after that only every remind_after seconds rather than every scan
+    SCHEMA = '''CREATE TABLE IF NOT EXISTS notified
+                (database TEXT NOT NULL,
+                 product_id INTEGER NOT NULL,
+                 state TEXT NOT NULL,
+                 notified INTEGER NOT NULL, -- unix time
+                 PRIMARY KEY (database, product_id, state)) WITHOUT ROWID'''
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None # opened on first use
+        self.lock = threading.Lock()
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(self.SCHEMA)
+        return self.conn
+
+    def unannounced(self, scan_result, remind_after, now=None):
+        # Returns a ScanResult of the products due a notification (never notified in their current state, or last
+        # notified at least remind_after seconds ago) and records them as notified now. Entries for products which
+        # are no longer expired or due - deleted, changed state or moved out of the window - are pruned, as are
+        # entries for databases which are no longer in the settings (not just missing from this scan, which may
+        # only cover some of them)
+        now = int(now or time.time())
+        rows = {}
+        with self.lock:
+            conn = self.connection()
+            with conn:
+                for number, database in enumerate(scan_result.databases):
+                    if scan_result.errors[number]: # couldn't be read, keep its entries until it can
+                        continue
+                    notified = dict(((product_id, state), at) for product_id, state, at in
+                                    conn.execute("SELECT product_id, state, notified FROM notified WHERE database = ?", (database,)))
+                    rows[number] = []
+                    announced = []
+                    for status in ScanResult.STATUSES: # expired rows come first in each database, so rows stays in expiry order
+                        start, end = scan_result.rows(number, status)
+                        for row in range(start, end):
+                            key = (scan_result.ids[row], status)
+                            last = notified.pop(key, None)
+                            if last is None or (remind_after > 0 and now - last >= remind_after):
+                                rows[number].append(row)
+                                announced.append((database, *key, now))
+                    conn.executemany("INSERT OR REPLACE INTO notified VALUES (?, ?, ?, ?)", announced)
+                    # anything left over was notified before but isn't expired or due any more
+                    conn.executemany("DELETE FROM notified WHERE database = ? AND product_id = ? AND state = ?",
+                                     [(database, *key) for key in notified])
+                configured = list(settings_store.databases)
+                conn.execute(f"DELETE FROM notified WHERE database NOT IN ({', '.join('?' * len(configured))})", configured)
+        return scan_result.subset(rows)
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+notification_ledger = NotificationLedger(NOTIFICATION_LEDGER)
+
+class RecordingBackend:
+    # Notification backend which only remembers what it was asked to show, for platforms without toasts and for tests.
+    # Any backend just needs show(title, message, status)
+    def __init__(self):
+        self.shown = [] # (title, message, status) in the order they were shown
+        self.lock = threading.Lock()
+
+    def show(self, title, message, status=None):
+        with self.lock:
+            self.shown.append((title, message, status))
+
+class NotificationDispatcher(threading.Thread):
+    # Shows notifications on their own thread so scans just queue them and carry on. Notifications are shown at
+    # least gap seconds apart, and if more than queue_size are waiting the oldest is dropped to make room
+    def __init__(self, backend, gap=2.0, queue_size=20):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.gap = gap
+        self.queue = queue.Queue(queue_size)
+        self.last_shown = None # time.monotonic() the last notification was shown
+        self.stopped = False
+
+    def notify(self, title, message, status=None, database=None):
+        # Queue a notification without waiting. database is only used to label its timing in scan_metrics
+        while True:
+            try:
+                self.queue.put_nowait((title, message, status, database))
+                return
+            except queue.Full:
+                try: # drop the oldest waiting notification, newer ones are more up to date
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                    scan_metrics.notification_dropped()
+                except queue.Empty: # the dispatcher got to it first
+                    pass
+
+    def run(self):
+        while not self.stopped:
+            notification = self.queue.get()
+            try:
+                if notification is None or self.stopped: # stop() wakes the thread with None
+                    continue
+                if self.last_shown is not None:
+                    wait = self.last_shown + self.gap - time.monotonic()
+                    if wait > 0:
+                        time.sleep(wait)
+                title, message, status, database = notification
+                start = time.perf_counter()
+                try:
+                    self.backend.show(title, message, status)
+                except Exception: # a notification which can't be shown mustn't stop the ones after it
+                    pass
+                self.last_shown = time.monotonic()
+                scan_metrics.observe(database or "(more)", "notify", time.perf_counter() - start)
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        # Block until every queued notification has been shown (or dropped)
+        self.queue.join()
+
+    def stop(self):
+        self.stopped = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full: # the thread is busy and will see stopped after the notification it is on
+            pass
+
+class PhaseTimer:
+    # Records how many seconds after start each phase was reached and, once every expected phase has been
+    # reached, appends them to a log file as one JSON line so startup times can be compared between runs
+    def __init__(self, log_path, expected):
+        self.started = time.perf_counter()
+        self.log_path = log_path
+        self.expected = set(expected)
+        self.phases = {}
+        self.saved = False
+        self.lock = threading.Lock()
+
+    def mark(self, phase):
+        with self.lock:
+            self.phases.setdefault(phase, round(time.perf_counter() - self.started, 3))
+            if self.saved or not self.expected.issubset(self.phases):
+                return
+            self.saved = True
+            record = {"started": datetime.now().isoformat(timespec="seconds"), **self.phases}
+        try:
+            with open(self.log_path, "a") as log:
+                log.write(json.dumps(record) + "\n")
+        except OSError: # timings are only for tracking, never stop IMPP over them
+            pass